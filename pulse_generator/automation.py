@@ -0,0 +1,81 @@
+from typing import Any, Dict, List
+
+import numpy as np
+from attrs import define
+
+try:
+    import tomllib
+except ImportError:  # pragma: no cover
+    import tomli as tomllib  # type: ignore
+
+START = 0
+STOP = 1
+PAUSE = 2
+STEP = 3
+TEMPO = 4
+SHUFFLE = 5
+
+ACTIONS = {
+    "start": START,
+    "stop": STOP,
+    "pause": PAUSE,
+    "step": STEP,
+    "tempo": TEMPO,
+    "shuffle": SHUFFLE,
+}
+
+
+@define
+class EventTable:
+    """Events of one pulser sorted by part * steps + step."""
+
+    positions: np.ndarray
+    actions: np.ndarray
+    values: np.ndarray
+    rows: List[List[float]]
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+def load_script(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as script_file:
+        return tomllib.load(script_file)
+
+
+def compile_script(
+    script: Dict[str, Any], pulser_steps: Dict[int, int]
+) -> Dict[int, EventTable]:
+    parts_per_bar = int(script.get("parts_per_bar", 1))
+    events: Dict[int, List[Any]] = {pulser_id: list() for pulser_id in pulser_steps}
+    rows: Dict[int, List[List[float]]] = {
+        pulser_id: list() for pulser_id in pulser_steps
+    }
+    for order, event in enumerate(script.get("event", list())):
+        action = event.get("action")
+        if action not in ACTIONS:
+            raise ValueError(f"Error: unknown action '{action}' in event {order}")
+        part = int(event.get("bar", 0)) * parts_per_bar + int(event.get("part", 0))
+        step = int(event.get("step", 2))
+        for pulser_id in event.get("pulsers", list(pulser_steps)):
+            if pulser_id not in events:
+                continue
+            steps = pulser_steps[pulser_id]
+            if step % 2 != 0 or step < 2 or step > steps:
+                raise ValueError(f"Error: step {step} in event {order} is not a pulse")
+            value = float(event.get("value", 0))
+            if ACTIONS[action] == SHUFFLE:
+                value = float(len(rows[pulser_id]))
+                rows[pulser_id].append([float(val) for val in event["value"]])
+            position = part * steps + step
+            events[pulser_id].append((position, order, ACTIONS[action], value))
+    tables: Dict[int, EventTable] = dict()
+    for pulser_id, pulser_events in events.items():
+        pulser_events.sort(key=lambda event: (event[0], event[1]))
+        tables[pulser_id] = EventTable(
+            positions=np.array([e[0] for e in pulser_events], dtype=np.int64),
+            actions=np.array([e[2] for e in pulser_events], dtype=np.int64),
+            values=np.array([e[3] for e in pulser_events], dtype=np.float64),
+            rows=rows[pulser_id],
+        )
+    return tables
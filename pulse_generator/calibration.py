@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import sounddevice as sd
+
+from .configs import InternalConfig
+
+
+class LatencyCache:
+    """Measured output latencies persisted on disk, keyed by device name."""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self.latencies: Dict[str, float] = dict()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as cache_file:
+                    self.latencies = json.load(cache_file)
+            except (OSError, ValueError):
+                logging.warning(f"Ignoring unreadable latency cache {self.path}")
+
+    @staticmethod
+    def key(audio_dev: Dict[str, Any]) -> str:
+        return f"{audio_dev['hostapi']}:{audio_dev['name']}"
+
+    def get(self, audio_dev: Dict[str, Any]) -> float:
+        return self.latencies[self.key(audio_dev)]
+
+    def has(self, audio_dev: Dict[str, Any]) -> bool:
+        return self.key(audio_dev) in self.latencies
+
+    def put(self, audio_dev: Dict[str, Any], latency: float) -> None:
+        self.latencies[self.key(audio_dev)] = latency
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as cache_file:
+            json.dump(self.latencies, cache_file, indent=2, sort_keys=True)
+
+
+def measure_latency(
+    audio_dev: Dict[str, Any], sample_rate: int, blocksize: int
+) -> float:
+    """Output latency reported by PortAudio for a short silent stream."""
+    internal_config = InternalConfig()
+    gaps: List[float] = list()
+
+    def callback(out_data, frames, ts, status):
+        out_data[:] = 0
+        gaps.append(ts.outputBufferDacTime - ts.currentTime)
+
+    stream = sd.OutputStream(
+        device=audio_dev["index"],
+        samplerate=sample_rate,
+        blocksize=blocksize,
+        dtype=np.float32,
+        latency=internal_config.sd_latency,
+        callback=callback,
+    )
+    with stream:
+        sd.sleep(int(internal_config.calibration_s * 1000))
+    reported = float(stream.latency)
+    measured = float(np.median(gaps)) if len(gaps) > 0 else 0.0
+    if measured <= 0.0:
+        measured = reported
+    logging.info(
+        f"Calibrated {audio_dev['name']} latency {measured * 1000:.2f} ms "
+        f"(reported {reported * 1000:.2f} ms)"
+    )
+    return measured
@@ -1,4 +1,5 @@
 import argparse
+import os
 from argparse import Namespace
 
 from pulse_generator.engine import Engine
@@ -27,16 +28,17 @@ def main(blocking: bool) -> Engine:
     parser.add_argument(
         "-t",
         "--tempos-init",
-        type=int,
+        type=float,
         default=60,
         help="initial beats per minute (default: %(default)s)",
     )
     parser.add_argument(
         "-s",
         "--steps-init",
-        type=int,
-        default=12,
-        help="initial steps per part - it has to be order of 4 and >= 8 (default: %(default)s)",
+        type=str,
+        default="12",
+        help="initial steps per part - it has to be order of 4 and >= 8, "
+        "comma separated per pulser, e.g. '12,16' (default: %(default)s)",
     )
     parser.add_argument(
         "-w",
@@ -66,10 +68,73 @@ def main(blocking: bool) -> Engine:
         default="USB Audio",
         help="initial beats per minute (default: %(default)s)",
     )
+    parser.add_argument(
+        "-c",
+        "--channels",
+        type=int,
+        default=1,
+        help="no. of output channels used per audio device (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o",
+        "--channel-map",
+        type=str,
+        default="",
+        help="comma separated device:channel outputs, e.g. '0:0,0:1,1:0' "
+        "(default: first '--channels' channels of every device)",
+    )
+    parser.add_argument(
+        "-i",
+        "--sync-in-match",
+        type=str,
+        default="",
+        help="input device to follow a sync pulse from (default: none)",
+    )
+    parser.add_argument(
+        "-n",
+        "--sync-in-channel",
+        type=int,
+        default=0,
+        help="input channel with the sync pulse (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-l",
+        "--calibrate",
+        action="store_true",
+        help="measure output latencies again instead of using the cache",
+    )
+    parser.add_argument(
+        "-p",
+        "--script",
+        type=str,
+        default="",
+        help="TOML automation script with start, stop, pause, step, tempo and "
+        "shuffle events (default: none)",
+    )
+    parser.add_argument(
+        "-k",
+        "--controller-match",
+        type=str,
+        default="",
+        help="read keys and knobs of this /dev/input device via evdev "
+        "(default: terminal keys only)",
+    )
     args = parser.parse_args()
-    steps_init = args.steps_init
-    if steps_init % 4 != 0 or steps_init < 8:
-        raise ValueError("Error: '--steps-init' has to be order of 4 and >= 8")
+    if not args.steps_init.replace(",", "").isdigit():
+        raise ValueError("Error: '--steps-init' has to be comma separated numbers")
+    args.steps_init = [int(steps) for steps in args.steps_init.split(",")]
+    for steps_init in args.steps_init:
+        if steps_init % 4 != 0 or steps_init < 8:
+            raise ValueError("Error: '--steps-init' has to be order of 4 and >= 8")
+    if args.rands_init < 1:
+        raise ValueError("Error: '--rands-init' has to be >= 1")
+    if args.channels < 1:
+        raise ValueError("Error: '--channels' has to be >= 1")
+    for pair in filter(None, args.channel_map.split(",")):
+        if len(pair.split(":")) != 2 or not pair.replace(":", "").isdigit():
+            raise ValueError("Error: '--channel-map' has to be device:channel pairs")
+    if args.script != "" and not os.path.isfile(args.script):
+        raise ValueError("Error: '--script' has to be an existing file")
     return run(args=args, blocking=blocking)
 
 
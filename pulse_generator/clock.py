@@ -0,0 +1,51 @@
+import heapq
+import math
+import time
+from typing import Callable, List, Tuple
+
+from textual.message_pump import MessagePump
+
+
+class Clock:
+    """Wall clock used by the pulsers and the UI state machine."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def set_timer(
+        self, owner: MessagePump, delay: float, callback: Callable[[], None]
+    ) -> None:
+        owner.set_timer(delay=delay, callback=callback)
+
+
+class VirtualClock(Clock):
+    """Deterministic clock that only moves when the simulation advances it."""
+
+    def __init__(self, start: float):
+        self.now = start
+        self.counter = 0
+        self.timers: List[Tuple[float, int, Callable[[], None]]] = list()
+
+    def time(self) -> float:
+        return self.now
+
+    def set_timer(
+        self, owner: MessagePump, delay: float, callback: Callable[[], None]
+    ) -> None:
+        heapq.heappush(
+            self.timers, (self.now + max(delay, 0.0), self.counter, callback)
+        )
+        self.counter += 1
+
+    def next_timer(self) -> float:
+        if len(self.timers) > 0:
+            return self.timers[0][0]
+        return math.inf
+
+    def run_timers(self) -> int:
+        fired = 0
+        while len(self.timers) > 0 and self.timers[0][0] <= self.now:
+            _, _, callback = heapq.heappop(self.timers)
+            callback()
+            fired += 1
+        return fired
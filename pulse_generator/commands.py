@@ -0,0 +1,78 @@
+import logging
+from multiprocessing import Queue
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from .clock import Clock
+
+
+class CommandTracker:
+    """Ids, submit times and pulser acks of every UI command.
+
+    A pulser acks a command with the part and step it was applied at and
+    the DAC time of the first step that carries it. The latency of a
+    command is that DAC time minus the submit time, kept per command type.
+    """
+
+    def __init__(self, ack_queue: Queue, clock: Clock, history: int = 1024):
+        self.ack_queue = ack_queue
+        self.clock = clock
+        self.history = history
+        self.next_id = 1
+        self.pending: Dict[int, Tuple[str, float, Set[int]]] = dict()
+        self.latencies: Dict[str, np.ndarray] = dict()
+        self.counts: Dict[str, int] = dict()
+
+    def submit(self, kind: str, pulser_ids: Sequence[int]) -> int:
+        cmd_id = self.next_id
+        self.next_id += 1
+        self.pending[cmd_id] = (kind, self.clock.time(), set(pulser_ids))
+        return cmd_id
+
+    def cancel(self, cmd_id: int) -> None:
+        self.pending.pop(cmd_id, None)
+
+    def poll(self) -> int:
+        acks = 0
+        while not self.ack_queue.empty():
+            cmd_id, pulser_id, part, step, dac_time = self.ack_queue.get()
+            acks += 1
+            if cmd_id not in self.pending:
+                continue
+            kind, submitted, pulser_ids = self.pending[cmd_id]
+            self.record(kind, dac_time - submitted)
+            logging.debug(
+                f"Applied {kind} command {cmd_id} on pulser {pulser_id} "
+                f"at part {part} step {step}"
+            )
+            pulser_ids.discard(pulser_id)
+            if len(pulser_ids) == 0:
+                del self.pending[cmd_id]
+        return acks
+
+    def record(self, kind: str, latency: float) -> None:
+        if kind not in self.latencies:
+            self.latencies[kind] = np.zeros(self.history, dtype=np.float64)
+            self.counts[kind] = 0
+        self.latencies[kind][self.counts[kind] % self.history] = latency
+        self.counts[kind] += 1
+
+    def pending_count(self, pulser_id: int) -> int:
+        return sum(pulser_id in ids for _, _, ids in self.pending.values())
+
+    def percentiles(self, kind: str) -> np.ndarray:
+        count = min(self.counts.get(kind, 0), self.history)
+        if count == 0:
+            return np.zeros(3)
+        return np.percentile(self.latencies[kind][0:count], [50, 90, 99])
+
+    def report(self) -> str:
+        lines: List[str] = list()
+        for kind in sorted(self.counts):
+            p50, p90, p99 = self.percentiles(kind) * 1000
+            lines.append(
+                f"{kind} latency p50 {p50:.1f} ms, p90 {p90:.1f} ms, "
+                f"p99 {p99:.1f} ms over {self.counts[kind]} acks"
+            )
+        return "\n".join(lines)
@@ -1,6 +1,6 @@
 from typing import List
 
-from attrs import define
+from attrs import define, field
 
 
 @define
@@ -8,11 +8,19 @@ class ExternalConfig:
     frequency: float
     amplitude: float
     audio_dev_match: str
-    tempos_init: int
+    tempos_init: float
     steps_init: int
     waits_init: int
     rands_init: int
     rands_mag: float
+    channels: int = 1
+    channel_map: str = ""
+    sync_in_match: str = ""
+    sync_in_channel: int = 0
+    calibrate: bool = False
+    pulser_steps: List[int] = field(factory=list)
+    script: str = ""
+    controller_match: str = ""
 
 
 @define
@@ -22,11 +30,27 @@ class InternalConfig:
     time_drift: float = 0.005
     sd_latency: float = 0.0005
     min_wave_val: float = 0.0005
-    main_python_sleep_s: float = 10.0
-    main_sd_sleep_ms: float = 1
     set_cpu_aff: bool = False
     rand_max: int = 9
     rand_quants: int = 4
+    sync_threshold: float = 0.3
+    sync_lock_edges: int = 4
+    sync_lock_tol: float = 0.05
+    sync_report_s: float = 10.0
+    pll_alpha: float = 0.5
+    pll_beta: float = 0.1
+    calibration_path: str = "~/.cache/pulse_generator/latency.json"
+    calibration_s: float = 1.0
+    latency_ladder: List[float] = [0.0005, 0.002, 0.005, 0.01, 0.02]
+    xrun_check_s: float = 1.0
+    xrun_stable_s: float = 60.0
+    xrun_headroom: float = 0.8
+    controller_tempo_step: float = 1.0
+    controller_mag_step: float = 0.05
+    controller_flush_s: float = 0.1
+    worker_log_size: int = 4096
+    worker_drain_s: float = 0.5
+    profile_path: str = "~/.cache/pulse_generator/profile-{name}.npy"
     shuffle_programs: List[str] = [
         "0-+",
         "0++",
@@ -0,0 +1,141 @@
+import logging
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple, cast
+
+import numpy as np
+from attrs import define
+
+from .clock import Clock
+from .configs import InternalConfig
+from .ui import UI
+
+try:
+    import evdev
+except ImportError:  # pragma: no cover
+    evdev = None
+
+EV_KEY = 1
+EV_REL = 2
+REL_HWHEEL = 6
+REL_DIAL = 7
+REL_WHEEL = 8
+KEY_DOWN = 1
+
+KEY_CODES = {
+    "4": 5,
+    "5": 6,
+    "6": 7,
+    "7": 8,
+    "8": 9,
+    "9": 10,
+    "e": 18,
+    "i": 23,
+    "a": 30,
+    "d": 32,
+    "f": 33,
+    "g": 34,
+    "h": 35,
+    "j": 36,
+    "k": 37,
+    "l": 38,
+    "c": 46,
+    "b": 48,
+}
+
+
+@define(frozen=True)
+class InputEvent:
+    """Same fields as an evdev event, for recorded event streams."""
+
+    time: float
+    type: int
+    code: int
+    value: int
+
+    def timestamp(self) -> float:
+        return self.time
+
+
+class Controller:
+    """Reads the key and knob device straight from /dev/input.
+
+    Key presses run the same actions as UI.BINDINGS. The tempo knob
+    (REL_DIAL) and the magnitude knob (REL_WHEEL) move in steps per detent.
+    Every event keeps its kernel timestamp so the input-to-effect latency
+    can be measured.
+    """
+
+    def __init__(
+        self,
+        device: Any,
+        ui: UI,
+        clock: Clock,
+        dispatch: Callable[[Callable[[], None]], Any],
+    ):
+        self.internal_config = InternalConfig()
+        self.device = device
+        self.ui = ui
+        self.clock = clock
+        self.dispatch = dispatch
+        self.key_actions: Dict[int, str] = dict()
+        for binding in ui.BINDINGS:
+            key, action, _ = cast(Tuple[str, str, str], binding)
+            if key in KEY_CODES:
+                self.key_actions[KEY_CODES[key]] = action
+        self.latencies: List[float] = list()
+        self.thread = threading.Thread(target=self.read_events, daemon=True)
+
+    def start(self) -> None:
+        if getattr(self.device, "grab", None) is not None:
+            self.device.grab()
+        self.thread.start()
+        logging.info(f"Reading controller {getattr(self.device, 'name', '')}")
+
+    def read_events(self) -> None:
+        for event in self.device.read_loop():
+            try:
+                self.handle(event)
+            except RuntimeError:
+                logging.debug(f"Dropped controller event {event.code}, UI is down")
+
+    def handle(self, event: Any) -> None:
+        if event.type == EV_KEY and event.value == KEY_DOWN:
+            action = self.key_actions.get(event.code)
+            if action is None:
+                return None
+            callback = getattr(self.ui, f"action_{action}")
+        elif event.type == EV_REL and event.code == REL_DIAL:
+            delta = event.value * self.internal_config.controller_tempo_step
+            callback = partial(self.ui.tempo_by, delta)
+        elif event.type == EV_REL and event.code == REL_WHEEL:
+            delta = event.value * self.internal_config.controller_mag_step
+            callback = partial(self.ui.rands_mag_by, delta)
+        else:
+            return None
+        self.dispatch(partial(self.apply, callback, event.timestamp()))
+
+    def apply(self, callback: Callable[[], None], when: float) -> None:
+        callback()
+        self.latencies = self.latencies[-1023:] + [self.clock.time() - when]
+
+    def report(self) -> str:
+        if len(self.latencies) == 0:
+            return "Controller saw no events"
+        p50, p90, p99 = np.percentile(self.latencies, [50, 90, 99]) * 1000
+        return (
+            f"Controller latency p50 {p50:.2f} ms, p90 {p90:.2f} ms, "
+            f"p99 {p99:.2f} ms over {len(self.latencies)} events"
+        )
+
+
+def find_controller(match: str) -> Any:
+    if evdev is None:
+        logging.warning("Install evdev to read the controller from /dev/input")
+        return None
+    for path in evdev.list_devices():
+        device = evdev.InputDevice(path)
+        if match in device.name:
+            return device
+    logging.warning(f"Found no input device matching '{match}'")
+    return None
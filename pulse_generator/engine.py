@@ -1,25 +1,54 @@
 import logging
 import math
+import multiprocessing as mp
 import os
-import time
+import random
 from argparse import Namespace
-from typing import List
+from logging.handlers import QueueListener
+from multiprocessing import Queue
+from typing import Dict, List, Optional, Type
 
 import sounddevice as sd
 
+from .automation import EventTable, compile_script, load_script
+from .calibration import LatencyCache, measure_latency
+from .clock import Clock
+from .commands import CommandTracker
 from .configs import ExternalConfig, InternalConfig
+from .controller import Controller, find_controller
+from .follower import ClockFollower, SyncState
+from .output import Output
 from .pulser import Pulser
+from .timeline import realign
+from .transactions import Transaction, TransactionLog
 from .ui import UI
 
 
 class Engine:
+    pulser_cls: Type[Pulser] = Pulser
 
-    def __init__(self, external_config: ExternalConfig):
+    def __init__(self, external_config: ExternalConfig, seed: Optional[int] = None):
         self.external_config = external_config
         self.internal_config = InternalConfig()
+        self.clock = self.get_clock()
+        self.rng = random.Random(seed)
+        self.log_queue = self.make_queue()
+        self.listener = QueueListener(
+            self.log_queue,
+            *(logging.getLogger().handlers or [logging.StreamHandler()]),
+            respect_handler_level=True,
+        )
+        self.listening = False
+        self.profile = mp.RawValue("b", 0)
         self.audio_devs = self.get_audio_devs()
+        self.sync_state: Optional[SyncState] = None
+        self.followers = self.get_followers()
+        self.latencies = self.get_latencies()
+        self.tracker = CommandTracker(ack_queue=self.make_queue(), clock=self.clock)
+        self.outputs = self.get_outputs()
         self.pulser_devs = self.get_pulser_devs()
         self.ui = self.get_ui()
+        self.controller = self.get_controller()
         if getattr(os, "sched_setaffinity", None) and self.internal_config.set_cpu_aff:
             pid = os.getpid()
             os.sched_setaffinity(pid, {0})  # type: ignore
@@ -31,37 +60,211 @@ class Engine:
             amplitude=args.amplitude,
             audio_dev_match=args.device_match,
             tempos_init=args.tempos_init,
-            steps_init=args.steps_init,
+            steps_init=args.steps_init[0],
             waits_init=args.waits_init,
             rands_init=args.rands_init,
             rands_mag=args.rands_magnitude,
+            channels=args.channels,
+            channel_map=args.channel_map,
+            sync_in_match=args.sync_in_match,
+            sync_in_channel=args.sync_in_channel,
+            calibrate=args.calibrate,
+            pulser_steps=args.steps_init,
+            script=args.script,
+            controller_match=args.controller_match,
         )
         engine = cls(external_config=external_config)
+        engine.start_logging()
         if blocking:
+            if engine.controller is not None:
+                engine.controller.start()
             engine.ui.run()
         return engine
 
-    def get_pulser_devs(self) -> List[Pulser]:
-        pulser_devs: List[Pulser] = list()
-        time_sync = math.ceil(time.time() + self.internal_config.first_start_delay)
-        for pulser_id, audio_dev in enumerate(self.audio_devs):
-            pulser = Pulser(
-                pulser_id=pulser_id,
-                external_config=self.external_config,
+    def get_outputs(self) -> List[Output]:
+        outputs: List[Output] = list()
+        time_sync = math.ceil(
+            self.clock.time() + self.internal_config.first_start_delay
+        )
+        pulser_id = 0
+        channel_map = self.get_channel_map()
+        for output_id, audio_dev in enumerate(self.audio_devs):
+            channels = channel_map.get(output_id, list())
+            if len(channels) == 0:
+                continue
+            pulsers: List[Pulser] = list()
+            for channel in channels:
+                pulser = self.pulser_cls(
+                    pulser_id=pulser_id,
+                    external_config=self.external_config,
+                    audio_dev=audio_dev,
+                    channel=channel,
+                    steps=self.get_steps(pulser_id),
+                    time_sync=float(time_sync),
+                    clock=self.clock,
+                    sync_state=self.sync_state,
+                )
+                pulsers.append(pulser)
+                pulser_id += 1
+            output = Output(
+                output_id=output_id,
                 audio_dev=audio_dev,
-                time_sync=float(time_sync),
+                pulsers=pulsers,
+                clock=self.clock,
+                latency=self.latencies.get(output_id, 0.0),
+                log_queue=self.log_queue,
+                profile=self.profile,
             )
-            pulser.detach_pulser()
-            pulser_devs.append(pulser)
-        return pulser_devs
+            outputs.append(output)
+        pulser_steps = {
+            pulser.pulser_id: pulser.steps
+            for output in outputs
+            for pulser in output.pulsers
+        }
+        self.transactions = TransactionLog(
+            pulsers=pulser_id,
+            length=max(pulser_steps.values(), default=self.external_config.steps_init)
+            // 2,
+        )
+        lengths = sorted({steps // 2 for steps in pulser_steps.values()})
+        if len(lengths) > 1:
+            logging.info(
+                f"Parts of {lengths} pulses realign every "
+                f"{realign(0, lengths)} pulses"
+            )
+        scripts = self.get_scripts(pulser_steps=pulser_steps)
+        for output in outputs:
+            for pulser in output.pulsers:
+                pulser.transactions = self.transactions
+                pulser.script = scripts.get(pulser.pulser_id)
+                pulser.ack_queue = self.tracker.ack_queue
+            self.start_output(output)
+        return outputs
+
+    def get_steps(self, pulser_id: int) -> int:
+        pulser_steps = self.external_config.pulser_steps
+        if len(pulser_steps) == 0:
+            return self.external_config.steps_init
+        return pulser_steps[min(pulser_id, len(pulser_steps) - 1)]
+
+    def get_scripts(self, pulser_steps: Dict[int, int]) -> Dict[int, EventTable]:
+        if self.external_config.script == "":
+            return dict()
+        scripts = compile_script(
+            script=load_script(self.external_config.script),
+            pulser_steps=pulser_steps,
+        )
+        events = sum(len(table) for table in scripts.values())
+        logging.info(
+            f"Compiled {events} script events from {self.external_config.script}"
+        )
+        return scripts
+
+    def transaction(self, pulser_ids: Optional[List[int]] = None) -> Transaction:
+        if pulser_ids is None:
+            pulser_ids = [pulser.pulser_id for pulser in self.pulser_devs]
+        return Transaction(log=self.transactions, pulser_ids=pulser_ids)
+
+    def get_latencies(self) -> Dict[int, float]:
+        latencies: Dict[int, float] = dict()
+        cache = LatencyCache(path=self.internal_config.calibration_path)
+        measured = 0
+        for dev_pos, audio_dev in enumerate(self.audio_devs):
+            if self.external_config.calibrate or not cache.has(audio_dev):
+                sample_rate = self.pulser_cls.sample_rate
+                latency = measure_latency(
+                    audio_dev=audio_dev,
+                    sample_rate=sample_rate,
+                    blocksize=int(sample_rate / self.external_config.frequency / 2),
+                )
+                cache.put(audio_dev, latency)
+                measured += 1
+            latencies[dev_pos] = cache.get(audio_dev)
+        if measured > 0:
+            cache.save()
+        return latencies
+
+    def get_followers(self) -> List[ClockFollower]:
+        followers: List[ClockFollower] = list()
+        if self.external_config.sync_in_match == "":
+            return followers
+        for dev in sd.query_devices():
+            if (
+                self.external_config.sync_in_match in dev["name"]
+                and dev["max_input_channels"] > self.external_config.sync_in_channel
+            ):
+                self.sync_state = SyncState()
+                follower = ClockFollower(
+                    audio_dev=dev,
+                    channel=self.external_config.sync_in_channel,
+                    clock=self.clock,
+                    sync_state=self.sync_state,
+                )
+                follower.detach_follower()
+                followers.append(follower)
+                break
+        else:
+            logging.warning("Found no sync input device, running as master")
+        return followers
+
+    def get_channel_map(self) -> Dict[int, List[int]]:
+        channel_map: Dict[int, List[int]] = dict()
+        for dev_pos, audio_dev in enumerate(self.audio_devs):
+            max_channels = audio_dev["max_output_channels"]
+            if self.external_config.channel_map == "":
+                channels = range(min(self.external_config.channels, max_channels))
+                channel_map[dev_pos] = list(channels)
+        for pair in filter(None, self.external_config.channel_map.split(",")):
+            dev_pos, channel = [int(val) for val in pair.split(":")]
+            if dev_pos >= len(self.audio_devs):
+                logging.warning(f"Skipping {pair} output, no such audio device")
+            elif channel >= self.audio_devs[dev_pos]["max_output_channels"]:
+                logging.warning(f"Skipping {pair} output, no such channel")
+            elif channel not in channel_map.setdefault(dev_pos, list()):
+                channel_map[dev_pos].append(channel)
+        return channel_map
+
+    def get_pulser_devs(self) -> List[Pulser]:
+        return [pulser for output in self.outputs for pulser in output.pulsers]
+
+    def start_output(self, output: Output) -> None:
+        output.detach_output()
+
+    def start_logging(self) -> None:
+        self.listener.start()
+        self.listening = True
+
+    def make_queue(self) -> Queue:
+        return Queue()
+
+    def get_clock(self) -> Clock:
+        return Clock()
 
     def get_ui(self) -> UI:
         ui = UI(
             pulser_devs=self.pulser_devs,
             external_config=self.external_config,
+            clock=self.clock,
+            rng=self.rng,
+            transactions=self.transactions,
+            tracker=self.tracker,
+            profile=self.profile,
         )
         return ui
 
+    def get_controller(self) -> Optional[Controller]:
+        if self.external_config.controller_match == "":
+            return None
+        device = find_controller(self.external_config.controller_match)
+        if device is None:
+            return None
+        return Controller(
+            device=device,
+            ui=self.ui,
+            clock=self.clock,
+            dispatch=self.ui.call_from_thread,
+        )
+
     def get_audio_devs(self) -> List:
         all_devs = sd.query_devices()
         some_devs = list()
@@ -75,6 +278,15 @@ class Engine:
         return some_devs
 
     def finish(self) -> "Engine":
-        for pulser in self.ui.pulser_devs:
-            pulser.process.kill()
+        for output in self.outputs:
+            output.process.kill()
+        for follower in self.followers:
+            follower.process.kill()
+        if self.controller is not None:
+            logging.info(self.controller.report())
+        self.tracker.poll()
+        logging.info(self.tracker.report())
+        if self.listening:
+            self.listener.stop()
+            self.listening = False
         return self
@@ -0,0 +1,188 @@
+import logging
+import multiprocessing as mp
+import time
+from multiprocessing import Process
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import sounddevice as sd
+
+from .clock import Clock
+from .configs import InternalConfig
+
+PERIOD = 0
+ANCHOR = 1
+LOCKED = 2
+LATENCY = 3
+JITTER = 4
+
+
+def detect_edges(block: np.ndarray, threshold: float, above: bool) -> np.ndarray:
+    """Indices of rising edges in a mono block, given the state before it."""
+    high = block > threshold
+    prev = np.empty_like(high)
+    prev[0] = above
+    prev[1:] = high[:-1]
+    return np.flatnonzero(high & ~prev)
+
+
+class PhaseLockedLoop:
+    """Second order loop that tracks the period and phase of incoming edges."""
+
+    def __init__(self, alpha: float, beta: float, lock_edges: int, lock_tol: float):
+        self.alpha = alpha
+        self.beta = beta
+        self.lock_edges = lock_edges
+        self.lock_tol = lock_tol
+        self.period: float = 0.0
+        self.next_edge: float = 0.0
+        self.last_edge: Optional[float] = None
+        self.good_edges: int = 0
+        self.errors: List[float] = list()
+
+    def locked(self) -> bool:
+        return self.good_edges >= self.lock_edges
+
+    def jitter(self) -> float:
+        if len(self.errors) < 2:
+            return 0.0
+        return float(np.std(self.errors))
+
+    def update(self, edge: float) -> None:
+        if self.last_edge is None:
+            self.last_edge = edge
+            return None
+        if self.period <= 0.0:
+            self.period = edge - self.last_edge
+            self.next_edge = edge + self.period
+            self.last_edge = edge
+            return None
+        missed = round((edge - self.next_edge) / self.period)
+        predicted = self.next_edge + missed * self.period
+        error = edge - predicted
+        if abs(error) <= self.lock_tol * self.period:
+            self.good_edges += 1
+        else:
+            self.good_edges = 0
+        self.errors = self.errors[-63:] + [error]
+        self.period += self.beta * error
+        self.next_edge = predicted + self.period + self.alpha * error
+        self.last_edge = edge
+
+
+class SyncState:
+    """Shared-memory view of the follower for the pulser processes."""
+
+    def __init__(self):
+        self.values = mp.RawArray("d", 5)
+        self.seq = mp.RawValue("i", 0)
+
+    def publish(
+        self, period: float, anchor: float, locked: bool, latency: float, jitter: float
+    ) -> None:
+        self.seq.value += 1
+        self.values[PERIOD] = period
+        self.values[ANCHOR] = anchor
+        self.values[LOCKED] = float(locked)
+        self.values[LATENCY] = latency
+        self.values[JITTER] = jitter
+        self.seq.value += 1
+
+    def read(self) -> List[float]:
+        while True:
+            seq = self.seq.value
+            values = list(self.values)
+            if seq % 2 == 0 and seq == self.seq.value:
+                return values
+
+    def locked(self) -> bool:
+        return self.values[LOCKED] > 0.0
+
+    def tempo_bpm(self) -> float:
+        return 60 / self.read()[PERIOD]
+
+    def next_edge(self, when: float) -> float:
+        period, anchor = self.read()[PERIOD : ANCHOR + 1]
+        return anchor + round((when + period - anchor) / period) * period
+
+
+class ClockFollower:
+    """Reads a sync pulse from an audio input and locks a loop to it."""
+
+    def __init__(
+        self,
+        audio_dev: Dict[str, Any],
+        channel: int,
+        clock: Clock,
+        sync_state: SyncState,
+    ):
+        self.internal_config = InternalConfig()
+        self.audio_dev = audio_dev
+        self.device_id = audio_dev["index"]
+        self.device_name = audio_dev["name"]
+        self.channel = channel
+        self.clock = clock
+        self.sync_state = sync_state
+        self.sample_rate = 48000
+        self.above = False
+        self.latencies: List[float] = list()
+        self.pll = PhaseLockedLoop(
+            alpha=self.internal_config.pll_alpha,
+            beta=self.internal_config.pll_beta,
+            lock_edges=self.internal_config.sync_lock_edges,
+            lock_tol=self.internal_config.sync_lock_tol,
+        )
+        self.process = Process(target=self.start_follower)
+        logging.info(f"Created {self.device_name} follower on channel {channel}")
+
+    def detach_follower(self):
+        self.process.start()
+
+    def callback(self, in_data, frames, ts, status):
+        block = in_data[:, self.channel]
+        edges = detect_edges(
+            block, self.internal_config.sync_threshold, above=self.above
+        )
+        self.above = bool(block[-1] > self.internal_config.sync_threshold)
+        if len(edges) == 0:
+            return None
+        time_now = self.clock.time()
+        first_sample = time_now - (ts.currentTime - ts.inputBufferAdcTime)
+        for edge in edges:
+            self.pll.update(first_sample + edge / self.sample_rate)
+        latency = time_now - (first_sample + edges[-1] / self.sample_rate)
+        self.latencies = self.latencies[-63:] + [latency]
+        if self.pll.period > 0.0:
+            self.sync_state.publish(
+                period=self.pll.period,
+                anchor=self.pll.next_edge,
+                locked=self.pll.locked(),
+                latency=float(np.mean(self.latencies)),
+                jitter=self.pll.jitter(),
+            )
+
+    def report(self) -> str:
+        values = self.sync_state.read()
+        if values[PERIOD] <= 0.0:
+            return f"{self.device_name} follower is waiting for sync pulses"
+        return (
+            f"{self.device_name} follower "
+            f"{'locked' if values[LOCKED] > 0.0 else 'unlocked'} "
+            f"at {60 / values[PERIOD]:.2f} bpm, "
+            f"latency {values[LATENCY] * 1000:.2f} ms, "
+            f"jitter {values[JITTER] * 1000:.3f} ms"
+        )
+
+    def start_follower(self):
+        stream = sd.InputStream(
+            device=self.device_id,
+            channels=self.channel + 1,
+            samplerate=self.sample_rate,
+            dtype=np.float32,
+            latency=self.internal_config.sd_latency,
+            callback=self.callback,
+        )
+        with stream:
+            while True:
+                time.sleep(self.internal_config.sync_report_s)
+                logging.info(self.report())
@@ -0,0 +1,158 @@
+import logging
+import os
+import time
+from logging.handlers import QueueHandler
+from multiprocessing import Process, Queue
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import sounddevice as sd
+
+from .clock import Clock
+from .configs import InternalConfig
+from .pulser import LOUD, QUIET, Pulser
+from .worklog import UNDERFLOW, WorkerLog
+
+
+class Output:
+    """One stream on one audio device feeding a pulser per channel."""
+
+    def __init__(
+        self,
+        output_id: int,
+        audio_dev: Dict[str, Any],
+        pulsers: List[Pulser],
+        clock: Clock,
+        latency: float,
+        log_queue: Queue,
+        profile: Any,
+    ):
+        self.output_id = output_id
+        self.internal_config = InternalConfig()
+        self.audio_dev = audio_dev
+        self.device_id = audio_dev["index"]
+        self.device_name = audio_dev["name"]
+        self.pulsers = pulsers
+        self.latency = latency
+        for pulser in pulsers:
+            pulser.output_latency = latency
+        self.clock = clock
+        self.sample_rate = pulsers[0].sample_rate
+        self.min_length = pulsers[0].min_length
+        self.channels = max(pulser.channel for pulser in pulsers) + 1
+        self.bank = np.zeros((self.min_length, 2), dtype=np.float32)
+        self.bank[:, QUIET] = self.internal_config.min_wave_val
+        self.bank[:, LOUD] = pulsers[0].pulse_loud[:, 0]
+        self.levels = np.full(self.channels, QUIET, dtype=np.intp)
+        self.right_times = np.array([pulser.right_time() for pulser in pulsers])
+        self.block_sec = self.min_length / self.sample_rate
+        self.ladder = self.internal_config.latency_ladder
+        self.level = 0
+        self.base_latency: Optional[float] = None
+        self.xruns = 0
+        self.slow_blocks = 0
+        self.log_queue = log_queue
+        self.worker_log = WorkerLog(
+            name=f"output{output_id}",
+            profile=profile,
+            size=self.internal_config.worker_log_size,
+        )
+        for pulser in pulsers:
+            pulser.worker_log = self.worker_log
+        self.process = Process(target=self.start_schedule)
+        logging.info(
+            f"Created {self.device_name} output with {len(pulsers)} pulsers "
+            f"on {self.channels} channels"
+        )
+
+    def detach_output(self):
+        for pulser in self.pulsers:
+            pulser.reset_interval_and_tempo()
+        self.right_times[:] = [pulser.right_time() for pulser in self.pulsers]
+        self.process.start()
+
+    def callback(self, out_data, frames, ts, status):
+        started = time.perf_counter()
+        if status is not None and status.output_underflow:
+            self.xruns += 1
+            self.worker_log.log(UNDERFLOW, self.level)
+        levels = self.levels
+        levels[:] = QUIET
+        for pulser in self.pulsers:
+            if pulser.run_sound_command():
+                levels[pulser.channel] = LOUD
+        time_now = self.clock.time()
+        for i in np.flatnonzero(time_now >= self.right_times):
+            pulser = self.pulsers[i]
+            if levels[pulser.channel] == QUIET:
+                levels[pulser.channel] = pulser.emit()
+                self.right_times[i] = pulser.right_time()
+        out_data[:] = self.bank[:, levels]
+        cost = time.perf_counter() - started
+        self.worker_log.sample(time_now, cost)
+        if cost > self.internal_config.xrun_headroom * self.block_sec:
+            self.slow_blocks += 1
+
+    def compensate(self, reported: float) -> None:
+        if self.base_latency is None:
+            self.base_latency = reported
+        for pulser in self.pulsers:
+            pulser.output_latency = self.latency + reported - self.base_latency
+        self.right_times[:] = [pulser.right_time() for pulser in self.pulsers]
+
+    def adapt(self, xruns: int, stable_s: float) -> int:
+        if xruns > 0 and self.level < len(self.ladder) - 1:
+            return self.level + 1
+        if (
+            xruns == 0
+            and self.level > 0
+            and stable_s >= self.internal_config.xrun_stable_s
+        ):
+            return self.level - 1
+        return self.level
+
+    def open_stream(self) -> sd.OutputStream:
+        return sd.OutputStream(
+            device=self.device_id,
+            channels=self.channels,
+            samplerate=self.sample_rate,
+            blocksize=self.min_length,
+            dtype=np.float32,
+            latency=self.ladder[self.level],
+            callback=self.callback,
+        )
+
+    def run_stream(self) -> int:
+        stable_s = 0.0
+        with self.open_stream() as stream:
+            self.compensate(float(stream.latency))
+            while True:
+                time.sleep(self.internal_config.xrun_check_s)
+                xruns = self.xruns + self.slow_blocks
+                self.xruns = 0
+                self.slow_blocks = 0
+                if xruns > 0:
+                    stable_s = 0.0
+                else:
+                    stable_s += self.internal_config.xrun_check_s
+                level = self.adapt(xruns=xruns, stable_s=stable_s)
+                if level != self.level:
+                    logging.warning(
+                        f"Switching {self.device_name} output latency from "
+                        f"{self.ladder[self.level] * 1000:.1f} ms to "
+                        f"{self.ladder[level] * 1000:.1f} ms after {xruns} xruns"
+                    )
+                    return level
+
+    def start_schedule(self):
+        pid = os.getpid()
+        if (
+            getattr(os, "sched_setaffinity", None) is not None
+            and self.internal_config.set_cpu_aff
+        ):
+            os.sched_setaffinity(pid, {self.output_id})  # type: ignore
+        handler = QueueHandler(self.log_queue)
+        logging.getLogger().handlers = [handler]
+        self.worker_log.start(handler)
+        while True:
+            self.level = self.run_stream()
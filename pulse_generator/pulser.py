@@ -1,32 +1,52 @@
 import logging
-import os
-import time
-from multiprocessing import Process, Queue
-from typing import Any, Dict
+from multiprocessing import Queue
+from typing import Any, Dict, Optional
 
 import numpy as np
-import sounddevice as sd
 from scipy import signal
 
+from .automation import SHUFFLE as SCRIPT_SHUFFLE
+from .automation import START as SCRIPT_START
+from .automation import STEP as SCRIPT_STEP
+from .automation import STOP as SCRIPT_STOP
+from .automation import TEMPO as SCRIPT_TEMPO
+from .automation import EventTable
+from .clock import Clock
 from .configs import ExternalConfig, InternalConfig
+from .follower import PERIOD, SyncState
+from .tables import RandTable
+from .timebase import Timebase
+from .timeline import position
+from .transactions import PAUSE, SHUFFLE, START, TEMPO, TransactionLog
+from .worklog import LATE_TRANSACTION, WorkerLog
+
+QUIET = 0
+LOUD = 1
 
 
 class Pulser:
+    sample_rate: int = 48000
 
     def __init__(
         self,
         pulser_id: int,
         external_config: ExternalConfig,
         audio_dev: Dict[str, Any],
+        channel: int,
+        steps: int,
         time_sync: float,
+        clock: Clock,
+        sync_state: Optional[SyncState],
     ):
         self.pulser_id: int = pulser_id
+        self.clock = clock
+        self.sync_state = sync_state
         self.external_config = external_config
         self.internal_config = InternalConfig()
         self.audio_dev = audio_dev
         self.device_id = audio_dev["index"]
         self.device_name = audio_dev["name"]
-        self.sample_rate = 48000
+        self.channel = channel
         self.min_length = int(self.sample_rate / external_config.frequency / 2)
         axis_x = np.arange(0, 1, 1 / self.sample_rate)[0 : self.min_length]
         self.pulse_loud = np.zeros((self.min_length, 1), dtype=np.float32)
@@ -35,106 +55,181 @@ class Pulser:
         )
         self.pulse_loud[-1] = 0
         self.not_skip: bool = True
+        self.output_latency: float = 0.0
         self.interval_sec: float = 0.0
-        self.tempo_in_queue: Queue[int] = Queue()
-        self.tempo_out_queue: Queue[int] = Queue()
-        self.pause_in_queue: Queue[str] = Queue()
-        self.sound_in_queue: Queue[str] = Queue()
-        self.rand_in_queue: Queue[float] = Queue()
-        self.steps = self.external_config.steps_init
+        self.tempo_out_queue: Queue[float] = self.make_queue()
+        self.pause_in_queue: Queue[int] = self.make_queue()
+        self.sound_in_queue: Queue[int] = self.make_queue()
+        self.ack_queue: Optional[Queue] = None
+        self.worker_log: Optional[WorkerLog] = None
+        self.steps = steps
+        self.pulses = steps // 2
         self.tempo_bpm = self.external_config.tempos_init
         self.time_sync: float = time_sync
+        self.timebase = Timebase(anchor=time_sync, tempo_bpm=self.tempo_bpm)
+        self.tick: int = 0
         self.step: int = 2
+        self.part: int = 0
+        self.pause_parts: int = 0
+        self.transactions: Optional[TransactionLog] = None
+        self.script: Optional[EventTable] = None
+        self.script_cursor: int = 0
+        self.stopped: bool = False
         self.reset_interval_and_tempo()
-        self.next_schedule = self.time_sync
-        self.process = Process(target=self.start_schedule)
-        self.randoms = [0.0] * (self.steps // 2)
+        self.randoms = np.zeros(self.pulses, dtype=np.float64)
+        self.rand_table = RandTable(
+            parts=max(self.internal_config.rand_max, external_config.rands_init),
+            length=self.pulses,
+        )
         logging.info(
-            f"Created {self.device_name} pulser with time sync {self.time_sync}"
+            f"Created {self.device_name} pulser on channel {self.channel} "
+            f"with time sync {self.time_sync}"
         )
 
-    def detach_pulser(self):
-        self.reset_interval_and_tempo()
-        self.process.start()
+    def make_queue(self) -> Queue:
+        return Queue()
+
+    @property
+    def next_schedule(self) -> float:
+        return self.timebase.time()
 
     def reset_interval_and_tempo(self):
-        self.interval_sec = round(1 / (self.tempo_bpm / 60), 3)
-        self.tempo_bpm = round(1 / (self.interval_sec / 60))
+        self.timebase.set_tempo(self.tempo_bpm)
+        self.interval_sec = self.timebase.interval_sec()
 
-    def play_sound(self):
+    def play_sound(self, cmd_id: int = 0) -> bool:
         if self.sound_in_queue.empty():
-            self.sound_in_queue.put("sound")
+            self.sound_in_queue.put(cmd_id)
+            return True
+        return False
 
-    def callback(self, out_data, frames, ts, status):
-        self.run_tempo_in_command()
+    def run_sound_command(self) -> bool:
         if not self.sound_in_queue.empty():
-            self.sound_in_queue.get()
-            out_data[:] = self.pulse_loud
-            return None
-        time_now = time.time()
-        right_time = (
+            cmd_id = self.sound_in_queue.get()
+            self.ack(cmd_id, self.step, self.clock.time() + self.output_latency)
+            return True
+        return False
+
+    def ack(self, cmd_id: int, step: int, dac_time: float) -> None:
+        if self.ack_queue is not None and cmd_id > 0:
+            self.ack_queue.put((cmd_id, self.pulser_id, self.part, step, dac_time))
+
+    def right_time(self) -> float:
+        return (
             self.next_schedule
             - self.internal_config.time_drift
+            - self.output_latency
             - self.randoms[(self.step // 2) - 1] * self.interval_sec
         )
-        if time_now >= right_time:
-            if self.not_skip:
-                out_data[:] = self.pulse_loud
-            else:
-                out_data[:] = self.internal_config.min_wave_val
-            self.next_schedule += self.interval_sec
-            if self.step == self.steps:
-                self.run_pause_command()
-                self.run_rand_in_command()
-                self.run_tempo_out_command()
-            self.step = self.step % self.steps
-            self.step += 2
+
+    def emit(self) -> int:
+        sound = self.run_script_command()
+        level = LOUD if (self.not_skip and not self.stopped) or sound else QUIET
+        if self.sync_state is not None and self.sync_state.locked():
+            self.timebase.rebase(self.sync_state.next_edge(self.next_schedule))
         else:
-            out_data[:] = self.internal_config.min_wave_val
+            self.timebase.advance()
+        if self.step == self.steps:
+            self.part += 1
+            self.run_rand_in_command()
+            self.run_transaction_command()
+            self.run_pause_command()
+            self.run_tempo_out_command()
+        self.tick += 1
+        self.part, self.step = position(self.tick, self.pulses)
+        if self.transactions is not None:
+            self.transactions.report(self.pulser_id, self.tick, self.pulses)
+        return level
 
-    def start_schedule(self):
-        pid = os.getpid()
-        if (
-            getattr(os, "sched_setaffinity", None) is not None
-            and self.internal_config.set_cpu_aff
-        ):
-            os.sched_setaffinity(pid, {self.pulser_id})  # type: ignore
-        stream = sd.OutputStream(
-            device=self.device_id,
-            samplerate=self.sample_rate,
-            blocksize=self.min_length,
-            dtype=np.float32,
-            latency=self.internal_config.sd_latency,
-            callback=self.callback,
-        )
-        with stream:
-            while True:
-                time.sleep(self.internal_config.main_python_sleep_s)
-                sd.sleep(self.internal_config.main_sd_sleep_ms)
+    def run_transaction_command(self):
+        if self.transactions is None:
+            return None
+        transactions = self.transactions
+        for slot in transactions.pending(self.pulser_id, self.tick):
+            late = (self.tick - transactions.slot_target[slot]) // self.pulses
+            if late > 0 and self.worker_log is not None:
+                self.worker_log.log(LATE_TRANSACTION, self.pulser_id, late)
+            flags = transactions.slot_flags[slot]
+            tempo_bpm = transactions.tempo(slot, self.pulser_id)
+            if flags & TEMPO and tempo_bpm > 0:
+                self.tempo_bpm = tempo_bpm
+            if flags & SHUFFLE:
+                self.randoms[:] = transactions.row(slot)[0 : len(self.randoms)]
+                self.randoms[0] = 0.0
+                self.randoms[self.pulses - 1] = 0.0
+            if flags & START:
+                self.pause_parts = 0
+            if flags & PAUSE:
+                self.pause_parts = transactions.slot_pause[slot]
+            transactions.ack(self.pulser_id, slot)
+            self.ack(transactions.slot_cmd[slot], 2, self.next_schedule)
 
-    def run_tempo_in_command(self):
-        if not self.tempo_in_queue.empty():
-            self.tempo_bpm = self.tempo_in_queue.get()
+    def run_script_command(self) -> bool:
+        script = self.script
+        if script is None or self.script_cursor >= len(script):
+            return False
+        position = self.part * self.steps + self.step
+        sound = False
+        while (
+            self.script_cursor < len(script)
+            and script.positions[self.script_cursor] <= position
+        ):
+            action = script.actions[self.script_cursor]
+            value = script.values[self.script_cursor]
+            if action == SCRIPT_START:
+                self.stopped = False
+                self.pause_parts = 0
+                self.not_skip = True
+            elif action == SCRIPT_STOP:
+                self.stopped = True
+            elif action == SCRIPT_STEP:
+                sound = True
+            elif action == SCRIPT_TEMPO:
+                self.tempo_bpm = float(value)
+                self.reset_interval_and_tempo()
+            elif action == SCRIPT_SHUFFLE:
+                row = script.rows[int(value)][0 : len(self.randoms)]
+                self.randoms[:] = 0.0
+                self.randoms[0 : len(row)] = row
+                self.randoms[0] = 0.0
+                self.randoms[self.pulses - 1] = 0.0
+            else:
+                self.not_skip = False
+                self.pause_parts = max(int(value) - 1, 0)
+            self.script_cursor += 1
+        return sound
 
     def run_rand_in_command(self):
-        if not self.rand_in_queue.empty():
-            for i in range(len(self.randoms)):
-                rand = self.rand_in_queue.get()
-                self.randoms[i] = rand
+        seq = self.rand_table.ack.value
+        row = self.rand_table.next_row(self.randoms)
+        if self.rand_table.ack.value != seq:
+            self.ack(
+                self.rand_table.cmds[self.rand_table.ack.value % 2],
+                2,
+                self.next_schedule,
+            )
+        if row:
             self.randoms[0] = 0.0
-            self.randoms[(self.steps // 2) - 1] = 0.0
-        else:
-            for i in range(len(self.randoms)):
-                self.randoms[i] = 0.0
+            self.randoms[self.pulses - 1] = 0.0
 
     def run_tempo_out_command(self):
         self.reset_interval_and_tempo()
+        self.run_sync_command()
         if self.tempo_out_queue.empty():
             self.tempo_out_queue.put(self.tempo_bpm)
 
     def run_pause_command(self):
         if not self.pause_in_queue.empty():
-            self.pause_in_queue.get()
+            cmd_id = self.pause_in_queue.get()
+            self.not_skip = cmd_id < 0
+            self.ack(abs(cmd_id), 2, self.next_schedule)
+        elif self.pause_parts > 0:
+            self.pause_parts -= 1
             self.not_skip = False
         else:
             self.not_skip = True
+
+    def run_sync_command(self):
+        if self.sync_state is not None and self.sync_state.locked():
+            self.tempo_bpm = 60 / self.sync_state.read()[PERIOD]
+            self.reset_interval_and_tempo()
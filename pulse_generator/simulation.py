@@ -0,0 +1,168 @@
+import math
+import queue
+from typing import Any, Dict, Iterator, List, Tuple, cast
+
+import numpy as np
+from attrs import define
+
+from .clock import Clock, VirtualClock
+from .configs import ExternalConfig
+from .controller import InputEvent
+from .engine import Engine
+from .output import Output
+from .pulser import Pulser
+
+
+@define(frozen=True)
+class Edge:
+    time: float
+    pulser_id: int
+    step: int
+    kind: str
+
+
+class SimulatedPulser(Pulser):
+
+    def make_queue(self) -> Any:
+        return queue.Queue()
+
+
+class FakeStream:
+    """Stand-in for an output stream that only wakes up on blocks that matter."""
+
+    def __init__(self, output: Output, clock: VirtualClock):
+        self.output = output
+        self.clock = clock
+        self.start = clock.time()
+        self.block_sec = output.min_length / output.sample_rate
+        self.block = -1
+        self.out_data = np.zeros((output.min_length, output.channels), dtype=np.float32)
+        self.edges: List[Edge] = list()
+
+    def next_block(self) -> Tuple[int, float]:
+        pulsers = self.output.pulsers
+        if any(not pulser.sound_in_queue.empty() for pulser in pulsers):
+            when = self.clock.time()
+        else:
+            when = min(pulser.right_time() for pulser in pulsers)
+        block = max(self.block + 1, math.ceil((when - self.start) / self.block_sec))
+        return block, self.start + block * self.block_sec
+
+    def process(self, block: int) -> None:
+        self.block = block
+        pulsers = self.output.pulsers
+        steps = [pulser.step for pulser in pulsers]
+        sounds = [not pulser.sound_in_queue.empty() for pulser in pulsers]
+        self.output.callback(self.out_data, len(self.out_data), None, None)
+        for pulser, step, sound in zip(pulsers, steps, sounds):
+            if sound:
+                kind = "sound"
+            elif pulser.step != step:
+                loud = np.array_equal(
+                    self.out_data[:, pulser.channel], pulser.pulse_loud[:, 0]
+                )
+                kind = "pulse" if loud else "skip"
+            else:
+                continue
+            self.edges.append(
+                Edge(
+                    time=self.clock.time(),
+                    pulser_id=pulser.pulser_id,
+                    step=step,
+                    kind=kind,
+                )
+            )
+
+
+class ReplayDevice:
+    """Recorded controller events played back instead of /dev/input."""
+
+    def __init__(self, events: List[InputEvent]):
+        self.name = "Replay"
+        self.events = events
+
+    def read_loop(self) -> Iterator[InputEvent]:
+        yield from self.events
+
+
+class Simulation(Engine):
+    """Engine, pulsers and UI state machine driven by a virtual clock."""
+
+    pulser_cls = SimulatedPulser
+
+    def __init__(
+        self,
+        external_config: ExternalConfig,
+        devices: int = 1,
+        channels: int = 2,
+        seed: int = 0,
+        start: float = 0.0,
+    ):
+        self.devices = devices
+        self.channels = channels
+        self.start = start
+        super().__init__(external_config=external_config, seed=seed)
+        self.ui.get_pulser_uis()
+        self.streams = [
+            FakeStream(output, self.virtual_clock) for output in self.outputs
+        ]
+
+    @property
+    def virtual_clock(self) -> VirtualClock:
+        assert isinstance(self.clock, VirtualClock)
+        return self.clock
+
+    def get_clock(self) -> Clock:
+        return VirtualClock(start=self.start)
+
+    def make_queue(self) -> Any:
+        return queue.Queue()
+
+    def get_audio_devs(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "index": i,
+                "name": f"Virtual Audio {i}",
+                "max_output_channels": self.channels,
+            }
+            for i in range(self.devices)
+        ]
+
+    def get_latencies(self) -> Dict[int, float]:
+        return {dev_pos: 0.0 for dev_pos in range(self.devices)}
+
+    def start_output(self, output: Output) -> None:
+        for pulser in output.pulsers:
+            pulser.reset_interval_and_tempo()
+        output.right_times[:] = [pulser.right_time() for pulser in output.pulsers]
+
+    def press(self, key: str) -> None:
+        for binding in self.ui.BINDINGS:
+            binding_key, action, _ = cast(Tuple[str, str, str], binding)
+            if binding_key == key:
+                getattr(self.ui, f"action_{action}")()
+                return None
+        raise ValueError(f"Error: no binding for key '{key}'")
+
+    def run_for(self, seconds: float) -> List[Edge]:
+        return self.run_until(self.clock.time() + seconds)
+
+    def run_until(self, when: float) -> List[Edge]:
+        clock = self.virtual_clock
+        while True:
+            blocks = [stream.next_block() for stream in self.streams]
+            next_time = min([clock.next_timer()] + [t for _, t in blocks])
+            if next_time > when:
+                break
+            clock.now = max(clock.now, next_time)
+            clock.run_timers()
+            for stream in self.streams:
+                block, block_time = stream.next_block()
+                if block_time <= clock.now:
+                    stream.process(block)
+        clock.now = max(clock.now, when)
+        return self.edges()
+
+    def edges(self) -> List[Edge]:
+        edges = [edge for stream in self.streams for edge in stream.edges]
+        return sorted(edges, key=lambda edge: (edge.time, edge.pulser_id))
@@ -0,0 +1,65 @@
+import logging
+import multiprocessing as mp
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+class RandTable:
+    """Double-buffered shared-memory table of per-part random offsets.
+
+    The UI publishes a whole table of parts into the back buffer and flips
+    the sequence number. The pulser switches to the new front buffer at its
+    next part boundary and reads one row per part without any IPC.
+    """
+
+    def __init__(self, parts: int, length: int):
+        self.parts = parts
+        self.length = length
+        self.buffer = mp.RawArray("d", 2 * parts * length)
+        self.rows = mp.RawArray("i", 2)
+        self.seq = mp.RawValue("i", 0)
+        self.ack = mp.RawValue("i", 0)
+        self.read = mp.RawValue("i", 0)
+        self.cmds = mp.RawArray("i", 2)
+        self._view: Optional[np.ndarray] = None
+
+    def view(self) -> np.ndarray:
+        if self._view is None:
+            self._view = np.frombuffer(self.buffer, dtype=np.float64).reshape(
+                2, self.parts, self.length
+            )
+        return self._view
+
+    def busy(self) -> bool:
+        seq = self.seq.value
+        return self.ack.value != seq or self.read.value < self.rows[seq % 2]
+
+    def publish(self, rows: Sequence[Sequence[float]], cmd_id: int = 0) -> bool:
+        if self.busy():
+            return False
+        if len(rows) > self.parts:
+            logging.warning(f"{len(rows)} parts do not fit in a table of {self.parts}")
+            return False
+        seq = self.seq.value + 1
+        back = seq % 2
+        if len(rows) > 0:
+            self.view()[back, 0 : len(rows)] = rows
+        self.rows[back] = len(rows)
+        self.cmds[back] = cmd_id
+        self.seq.value = seq
+        return True
+
+    def next_row(self, out: np.ndarray) -> bool:
+        seq = self.seq.value
+        if self.ack.value != seq:
+            self.read.value = 0
+            self.ack.value = seq
+        front = seq % 2
+        read = self.read.value
+        if read < self.rows[front]:
+            out[:] = self.view()[front, read]
+            self.read.value = read + 1
+            return True
+        out[:] = 0.0
+        return False
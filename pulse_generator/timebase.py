@@ -0,0 +1,37 @@
+from fractions import Fraction
+
+
+class Timebase:
+    """Step times counted from an anchor with an exact rational interval.
+
+    The n-th step after the anchor is at anchor + n * interval, so the error
+    stays within one float rounding no matter how long the session runs.
+    Tempo changes move the anchor to the current step and restart the count.
+    """
+
+    def __init__(self, anchor: float, tempo_bpm: float):
+        self.anchor = Fraction(anchor)
+        self.count = 0
+        self.interval = 60 / self.exact_tempo(tempo_bpm)
+
+    @staticmethod
+    def exact_tempo(tempo_bpm: float) -> Fraction:
+        return Fraction(tempo_bpm).limit_denominator(1000)
+
+    def set_tempo(self, tempo_bpm: float) -> None:
+        self.anchor += self.count * self.interval
+        self.count = 0
+        self.interval = 60 / self.exact_tempo(tempo_bpm)
+
+    def rebase(self, when: float) -> None:
+        self.anchor = Fraction(when)
+        self.count = 0
+
+    def advance(self) -> None:
+        self.count += 1
+
+    def interval_sec(self) -> float:
+        return float(self.interval)
+
+    def time(self) -> float:
+        return float(self.anchor + self.count * self.interval)
@@ -0,0 +1,18 @@
+import math
+from typing import Sequence, Tuple
+
+
+def position(tick: int, pulses: int) -> Tuple[int, int]:
+    """Part and step of a pulser with `pulses` pulses per part at a tick."""
+    return tick // pulses, 2 * (tick % pulses) + 2
+
+
+def boundary(tick: int, pulses: int) -> int:
+    """Last tick of the part that contains the tick."""
+    return (tick // pulses + 1) * pulses - 1
+
+
+def realign(tick: int, lengths: Sequence[int]) -> int:
+    """First tick after this one where every part starts together."""
+    period = math.lcm(*lengths)
+    return (tick // period + 1) * period
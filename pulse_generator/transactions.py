@@ -0,0 +1,165 @@
+import logging
+import multiprocessing as mp
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .timeline import boundary
+
+TEMPO = 1
+SHUFFLE = 2
+PAUSE = 4
+START = 8
+
+
+class TransactionLog:
+    """Shared ring of transactions that every pulser applies at one boundary.
+
+    A commit is a single write into one slot no matter how many pulsers it
+    covers. Slots are stamped with a global tick and each pulser applies them
+    at its first own part boundary at or after that tick, so pulsers with the
+    same part length apply them together.
+    """
+
+    def __init__(self, pulsers: int, length: int, slots: int = 16):
+        self.pulsers = pulsers
+        self.length = length
+        self.slots = slots
+        self.seq = mp.RawValue("i", 0)
+        self.ticks = mp.RawArray("i", pulsers)
+        self.pulses = mp.RawArray("i", pulsers)
+        self.applied = mp.RawArray("i", slots * pulsers)
+        self.slot_seq = mp.RawArray("i", slots)
+        self.slot_target = mp.RawArray("i", slots)
+        self.slot_flags = mp.RawArray("i", slots)
+        self.slot_pause = mp.RawArray("i", slots)
+        self.slot_cmd = mp.RawArray("i", slots)
+        self.slot_members = mp.RawArray("b", slots * pulsers)
+        self.slot_tempo = mp.RawArray("d", slots * pulsers)
+        self.slot_rows = mp.RawArray("d", slots * length)
+
+    def report(self, pulser_id: int, tick: int, pulses: int) -> None:
+        self.ticks[pulser_id] = tick
+        self.pulses[pulser_id] = pulses
+
+    def target_tick(self, pulser_ids: Sequence[int]) -> int:
+        target = max(self.ticks[pulser_id] for pulser_id in pulser_ids)
+        for pulser_id in pulser_ids:
+            tick = self.ticks[pulser_id]
+            if tick == target and tick == boundary(tick, self.pulses[pulser_id]):
+                return target + 1
+        return target
+
+    def reached(self, pulser_ids: Sequence[int], target: int) -> bool:
+        return all(
+            self.ticks[pulser_id] > boundary(target, self.pulses[pulser_id])
+            for pulser_id in pulser_ids
+        )
+
+    def free_slot(self) -> Optional[int]:
+        for slot in range(self.slots):
+            seq = self.slot_seq[slot]
+            members = range(slot * self.pulsers, (slot + 1) * self.pulsers)
+            if all(self.applied[i] == seq for i in members if self.slot_members[i]):
+                return slot
+        return None
+
+    def commit(
+        self,
+        pulser_ids: Sequence[int],
+        flags: int,
+        tempos: Dict[int, float],
+        pause: int,
+        row: Optional[Sequence[float]],
+        cmd_id: int = 0,
+    ) -> int:
+        if len(pulser_ids) == 0 or flags == 0:
+            return -1
+        slot = self.free_slot()
+        if slot is None:
+            logging.warning("Dropped transaction, all slots are pending")
+            return -1
+        target = self.target_tick(pulser_ids)
+        self.slot_seq[slot] = 0
+        base = slot * self.pulsers
+        for pulser_id in range(self.pulsers):
+            self.slot_members[base + pulser_id] = pulser_id in pulser_ids
+            self.slot_tempo[base + pulser_id] = tempos.get(pulser_id, 0.0)
+        if row is not None:
+            start = slot * self.length
+            self.slot_rows[start : start + len(row)] = list(row)
+        self.slot_target[slot] = target
+        self.slot_flags[slot] = flags
+        self.slot_pause[slot] = pause
+        self.slot_cmd[slot] = cmd_id
+        self.seq.value += 1
+        self.slot_seq[slot] = self.seq.value
+        return target
+
+    def pending(self, pulser_id: int, tick: int) -> List[int]:
+        slots = list()
+        for slot in range(self.slots):
+            seq = self.slot_seq[slot]
+            if (
+                seq > 0
+                and seq != self.applied[slot * self.pulsers + pulser_id]
+                and self.slot_members[slot * self.pulsers + pulser_id]
+                and self.slot_target[slot] <= tick
+            ):
+                slots.append(slot)
+        slots.sort(key=lambda slot: self.slot_seq[slot])
+        return slots
+
+    def row(self, slot: int) -> np.ndarray:
+        view = np.frombuffer(self.slot_rows, dtype=np.float64)
+        return view[slot * self.length : (slot + 1) * self.length]
+
+    def tempo(self, slot: int, pulser_id: int) -> float:
+        return self.slot_tempo[slot * self.pulsers + pulser_id]
+
+    def ack(self, pulser_id: int, slot: int) -> None:
+        self.applied[slot * self.pulsers + pulser_id] = self.slot_seq[slot]
+
+
+class Transaction:
+    """Group of changes for a set of pulsers, applied at one part boundary."""
+
+    def __init__(self, log: TransactionLog, pulser_ids: Sequence[int], cmd_id: int = 0):
+        self.log = log
+        self.pulser_ids = list(pulser_ids)
+        self.cmd_id = cmd_id
+        self.flags = 0
+        self.tempos: Dict[int, float] = dict()
+        self.pause_parts = 0
+        self.shuffle_row: Optional[List[float]] = None
+
+    def tempo(self, tempo_bpm: float, pulser_id: Optional[int] = None) -> "Transaction":
+        self.flags |= TEMPO
+        for other_id in self.pulser_ids:
+            if pulser_id is None or pulser_id == other_id:
+                self.tempos[other_id] = tempo_bpm
+        return self
+
+    def shuffle(self, randoms: Sequence[float]) -> "Transaction":
+        self.flags |= SHUFFLE
+        self.shuffle_row = list(randoms)
+        return self
+
+    def pause(self, parts: int) -> "Transaction":
+        self.flags |= PAUSE
+        self.pause_parts = parts
+        return self
+
+    def start(self) -> "Transaction":
+        self.flags |= START
+        return self
+
+    def commit(self) -> int:
+        return self.log.commit(
+            pulser_ids=self.pulser_ids,
+            flags=self.flags,
+            tempos=self.tempos,
+            pause=self.pause_parts,
+            row=self.shuffle_row,
+            cmd_id=self.cmd_id,
+        )
@@ -1,19 +1,23 @@
+import logging
 import random
-import time
-from typing import List
+from typing import Any, Dict, List
 
 from textual.app import App, ComposeResult
 from textual.containers import ScrollableContainer
 from textual.reactive import reactive
 from textual.widgets import Button, Footer, Static
 
+from .clock import Clock
+from .commands import CommandTracker
 from .configs import ExternalConfig, InternalConfig
 from .pulser import Pulser
+from .timebase import Timebase
+from .transactions import Transaction, TransactionLog
 
 
 class PulserDisplay(Static):
-    tempos_val = reactive(0)
-    tempo_val = reactive(0)
+    tempos_val = reactive(0.0)
+    tempo_val = reactive(0.0)
     steps_val = reactive(0)
     step_val = reactive(0)
     waits_val = reactive(0)
@@ -22,21 +26,26 @@ class PulserDisplay(Static):
     rand_val = reactive(0)
     shuffle_val = reactive(0)
     stopped = reactive(False)
+    pending_val = reactive(0)
 
     def __init__(
         self,
         dev_name: str,
-        tempos_init: int,
-        tempo_init: int,
+        tempos_init: float,
+        tempo_init: float,
         steps_init: int,
         waits_init: int,
         rands_init: int,
         pulser: Pulser,
         pause_button: Button,
         stop_button: Button,
+        clock: Clock,
+        tracker: CommandTracker,
     ):
         super().__init__()
         self.internal_config = InternalConfig()
+        self.clock = clock
+        self.tracker = tracker
         self.pause_button = pause_button
         self.stop_button = stop_button
         self.dev_name = (
@@ -59,19 +68,21 @@ class PulserDisplay(Static):
         self.commands: List[str] = list()
         self.pulser = pulser
         self.interval_sec: float = 0.0
+        self.timebase = Timebase(
+            anchor=self.pulser.next_schedule, tempo_bpm=self.tempo_val
+        )
         self.reset_interval_and_tempo()
-        self.next_schedule = self.pulser.next_schedule
         self.randoms = [0.0] * (self.steps_val // 2)
-        self.set_timer(
-            delay=self.next_schedule - time.time() - self.internal_config.time_drift,
-            callback=self.run_schedule,
-        )
+        self.schedule_next()
 
     def reset_interval_and_tempo(self):
-        self.interval_sec = round(1 / (self.tempo_val / 60), 3)
-        self.tempos_val = round(1 / (self.interval_sec / 60))
+        self.timebase.set_tempo(self.tempo_val)
+        self.interval_sec = self.timebase.interval_sec()
+        self.tempos_val = self.tempo_val
 
     def run_schedule(self) -> None:
+        self.tracker.poll()
+        self.pending_val = self.tracker.pending_count(self.pulser.pulser_id)
         if self.step_val == self.steps_val:
             self.run_wait_command()
             self.run_rand_command()
@@ -82,9 +93,15 @@ class PulserDisplay(Static):
         self.step_val = step_val
         if self.step_val == 2:
             self.run_tempo_out_command()
-        self.next_schedule += self.interval_sec
-        self.set_timer(
-            delay=self.next_schedule - time.time() - self.internal_config.time_drift,
+        self.timebase.advance()
+        self.schedule_next()
+
+    def schedule_next(self) -> None:
+        self.clock.set_timer(
+            owner=self,
+            delay=self.timebase.time()
+            - self.clock.time()
+            - self.internal_config.time_drift,
             callback=self.run_schedule,
         )
 
@@ -118,7 +135,7 @@ class PulserDisplay(Static):
             elif command == "rand":
                 self.rand_val = 0
         if self.stopped and self.pulser.pause_in_queue.empty():
-            self.pulser.pause_in_queue.put("pause")
+            self.pulser.pause_in_queue.put(0)
 
     def run_tempo_out_command(self):
         if not self.pulser.tempo_out_queue.empty():
@@ -127,10 +144,11 @@ class PulserDisplay(Static):
 
     def update_all(self):
         self.update(
-            f"D:{self.dev_name} T: {self.tempo_val:03}/{self.tempos_val:03} "
+            f"D:{self.dev_name} T: {self.tempo_val:03g}/{self.tempos_val:03g} "
             f"S:{self.step_val:02}/{self.steps_val:02} "
             f"W:{self.wait_val:02}/{self.waits_val:02} "
-            f"R:{self.rand_val:01}/{self.rands_val:01} P:{self.shuffle_val}"
+            f"R:{self.rand_val:01}/{self.rands_val:01} P:{self.shuffle_val} "
+            f"C:{self.pending_val}"
         )
 
     def watch_step_val(self) -> None:
@@ -160,11 +178,16 @@ class PulserDisplay(Static):
     def watch_shuffle_val(self) -> None:
         self.update_all()
 
+    def watch_pending_val(self) -> None:
+        self.update_all()
+
     def start(self) -> bool:
         if len(self.commands) == 0:
             self.commands.append("start")
             if not self.pulser.pause_in_queue.empty():
                 self.pulser.pause_in_queue.get()
+            cmd_id = self.tracker.submit("start", [self.pulser.pulser_id])
+            self.pulser.pause_in_queue.put(-cmd_id)
             return True
         else:
             return False
@@ -172,7 +195,8 @@ class PulserDisplay(Static):
     def stop(self) -> bool:
         if len(self.commands) == 0 and self.pulser.pause_in_queue.empty():
             self.commands.append("stop")
-            self.pulser.pause_in_queue.put("pause")
+            cmd_id = self.tracker.submit("stop", [self.pulser.pulser_id])
+            self.pulser.pause_in_queue.put(cmd_id)
             return True
         else:
             return False
@@ -182,53 +206,55 @@ class PulserDisplay(Static):
             self.commands.append("pause")
             self.pause_button.disabled = True
             self.stop_button.disabled = True
+            cmd_id = self.tracker.submit("pause", [self.pulser.pulser_id])
             for i in range(self.waits_val):
-                self.pulser.pause_in_queue.put("pause")
+                self.pulser.pause_in_queue.put(cmd_id if i == 0 else 0)
             return True
         else:
             return False
 
     def rand(self) -> bool:
-        if len(self.commands) == 0 and self.pulser.rand_in_queue.empty():
-            self.commands.append("rand")
-            self.pause_button.disabled = True
-            self.stop_button.disabled = True
+        if len(self.commands) == 0 and not self.pulser.rand_table.busy():
             shuffle_prog = self.internal_config.shuffle_programs[self.shuffle_val]
+            rows: List[List[float]] = list()
             for i in range(self.rands_val):
                 j = i % 2
-                for _rand_ in self.randoms:
-                    if shuffle_prog[2:3] == "+":
-                        self.pulser.rand_in_queue.put(_rand_)
-                    elif j == 1:
-                        self.pulser.rand_in_queue.put(-_rand_)
+                if shuffle_prog[2:3] == "+":
+                    rows.append(self.randoms)
+                elif j == 1:
+                    rows.append([-_rand_ for _rand_ in self.randoms])
+            cmd_id = self.tracker.submit("rand", [self.pulser.pulser_id])
+            if not self.pulser.rand_table.publish(rows, cmd_id=cmd_id):
+                self.tracker.cancel(cmd_id)
+                return False
+            self.commands.append("rand")
+            self.pause_button.disabled = True
+            self.stop_button.disabled = True
             return True
         else:
             return False
 
     def step(self) -> bool:
-        self.pulser.play_sound()
+        cmd_id = self.tracker.submit("step", [self.pulser.pulser_id])
+        if not self.pulser.play_sound(cmd_id=cmd_id):
+            self.tracker.cancel(cmd_id)
+            return False
         return True
 
-    def tempos_up(self, up: int) -> bool:
+    def tempos_up(self, up: float, transaction: Transaction) -> bool:
         tempos_val = self.tempos_val
         tempos_val += up
         self.tempos_val = tempos_val
-        if self.pulser.tempo_in_queue.empty():
-            self.pulser.tempo_in_queue.put(self.tempos_val)
-            return True
-        else:
-            return False
+        transaction.tempo(self.tempos_val, pulser_id=self.pulser.pulser_id)
+        return True
 
-    def tempos_down(self, down: int) -> bool:
+    def tempos_down(self, down: float, transaction: Transaction) -> bool:
         if self.tempos_val >= down * 2:
             tempos_val = self.tempos_val
             tempos_val -= down
             self.tempos_val = tempos_val
-            if self.pulser.tempo_in_queue.empty():
-                self.pulser.tempo_in_queue.put(self.tempos_val)
-                return True
-            else:
-                return False
+            transaction.tempo(self.tempos_val, pulser_id=self.pulser.pulser_id)
+            return True
         else:
             return False
 
@@ -297,15 +323,17 @@ class PulserUI(Static):
     def __init__(
         self,
         pulser: Pulser,
-        tempos_init: int,
-        tempo_init: int,
+        tempos_init: float,
+        tempo_init: float,
         steps_init: int,
         waits_init: int,
         rands_init: int,
+        clock: Clock,
+        tracker: CommandTracker,
     ):
         super().__init__()
         self.pulser = pulser
-        self.dev_name = pulser.device_name
+        self.dev_name = f"{pulser.device_name} {pulser.channel}"
         self.tempos_init = tempos_init
         self.tempo_init = tempo_init
         self.steps_init = steps_init
@@ -323,6 +351,8 @@ class PulserUI(Static):
             pulser=self.pulser,
             pause_button=self.pause_button,
             stop_button=self.stop_button,
+            clock=clock,
+            tracker=tracker,
         )
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
@@ -372,81 +402,168 @@ class UI(App):
         ("4", "wait_down", "W-"),
         ("8", "shuffle", "S"),
         ("5", "random_up", "R"),
+        ("p", "toggle_profile", "Prof"),
     ]
 
     def __init__(
         self,
         pulser_devs: List[Pulser],
         external_config: ExternalConfig,
+        clock: Clock,
+        rng: random.Random,
+        transactions: TransactionLog,
+        tracker: CommandTracker,
+        profile: Any,
     ):
         super().__init__()
         self.pulser_devs = pulser_devs
         self.external_config = external_config
+        self.clock = clock
+        self.rng = rng
+        self.transactions = transactions
+        self.tracker = tracker
+        self.profile = profile
         self.internal_config = InternalConfig()
-        self.randoms = [0.0] * (external_config.steps_init // 2)
+        self.randoms: Dict[int, List[float]] = {
+            pulses: [0.0] * pulses
+            for pulses in sorted({pulser.pulses for pulser in pulser_devs})
+        }
         self.shuffle_prod = self.internal_config.shuffle_program
         self.pulser_uis: List[PulserUI] = list()
+        self.tempos: Dict[int, float] = dict()
+        self.tempo_dirty = False
+        self.tempo_target = -1
         self.randomize()
 
     def randomize(self):
         shuffle_prog = self.shuffle_prod
-        for i in range(len(self.randoms)):
-            val = random.uniform(
-                -self.external_config.rands_mag, self.external_config.rands_mag
-            )
-            val = (
-                round(val * self.internal_config.rand_quants)
-                / self.internal_config.rand_quants
-            )
-            self.randoms[i] = val
-        self.randoms[0] = 0
-        self.randoms[len(self.randoms) - 1] = 0
-        half = len(self.randoms) // 2
-        for i in range(half, half * 2):
-            if shuffle_prog[0:2] == "0-":
-                self.randoms[i] = -self.randoms[(2 * half) - i - 1]
-            elif shuffle_prog[0:2] == "0+":
-                self.randoms[i] = self.randoms[(2 * half) - i - 1]
-            elif shuffle_prog[0:2] == "++":
-                self.randoms[(2 * half) - i - 1] = abs(self.randoms[(2 * half) - i - 1])
-                self.randoms[i] = self.randoms[(2 * half) - i - 1]
-            elif shuffle_prog[0:2] == "--":
-                self.randoms[(2 * half) - i - 1] = -abs(
-                    self.randoms[(2 * half) - i - 1]
+        for randoms in self.randoms.values():
+            for i in range(len(randoms)):
+                val = self.rng.uniform(
+                    -self.external_config.rands_mag, self.external_config.rands_mag
                 )
-                self.randoms[i] = self.randoms[(2 * half) - i - 1]
-            elif shuffle_prog[0:2] == "-+":
-                self.randoms[(2 * half) - i - 1] = -abs(
-                    self.randoms[(2 * half) - i - 1]
+                val = (
+                    round(val * self.internal_config.rand_quants)
+                    / self.internal_config.rand_quants
                 )
-                self.randoms[i] = -self.randoms[(2 * half) - i - 1]
-            elif shuffle_prog[0:2] == "+-":
-                self.randoms[(2 * half) - i - 1] = abs(self.randoms[(2 * half) - i - 1])
-                self.randoms[i] = -self.randoms[(2 * half) - i - 1]
+                randoms[i] = val
+            randoms[0] = 0
+            randoms[len(randoms) - 1] = 0
+            half = len(randoms) // 2
+            for i in range(half, half * 2):
+                if shuffle_prog[0:2] == "0-":
+                    randoms[i] = -randoms[(2 * half) - i - 1]
+                elif shuffle_prog[0:2] == "0+":
+                    randoms[i] = randoms[(2 * half) - i - 1]
+                elif shuffle_prog[0:2] == "++":
+                    randoms[(2 * half) - i - 1] = abs(randoms[(2 * half) - i - 1])
+                    randoms[i] = randoms[(2 * half) - i - 1]
+                elif shuffle_prog[0:2] == "--":
+                    randoms[(2 * half) - i - 1] = -abs(randoms[(2 * half) - i - 1])
+                    randoms[i] = randoms[(2 * half) - i - 1]
+                elif shuffle_prog[0:2] == "-+":
+                    randoms[(2 * half) - i - 1] = -abs(randoms[(2 * half) - i - 1])
+                    randoms[i] = -randoms[(2 * half) - i - 1]
+                elif shuffle_prog[0:2] == "+-":
+                    randoms[(2 * half) - i - 1] = abs(randoms[(2 * half) - i - 1])
+                    randoms[i] = -randoms[(2 * half) - i - 1]
 
     def compose(self) -> ComposeResult:
+        yield Footer()
+        yield ScrollableContainer(*self.get_pulser_uis())
+
+    def get_pulser_uis(self) -> List[PulserUI]:
+        if len(self.pulser_uis) > 0:
+            return self.pulser_uis
         for pulser in self.pulser_devs:
             pulser_ui = PulserUI(
                 pulser=pulser,
                 tempos_init=self.external_config.tempos_init,
                 tempo_init=pulser.tempo_bpm,
-                steps_init=self.external_config.steps_init,
+                steps_init=pulser.steps,
                 waits_init=self.external_config.waits_init,
                 rands_init=self.external_config.rands_init,
+                clock=self.clock,
+                tracker=self.tracker,
             )
             pulser_ui.add_class("started")
-            pulser_ui.pulser_display.copy_randoms(self.randoms)
+            pulser_ui.pulser_display.copy_randoms(self.randoms[pulser.pulses])
             self.pulser_uis.append(pulser_ui)
-        yield Footer()
-        yield ScrollableContainer(*self.pulser_uis)
+        return self.pulser_uis
+
+    def transaction(self, kind: str) -> Transaction:
+        pulser_ids = [pulser.pulser_id for pulser in self.pulser_devs]
+        cmd_id = self.tracker.submit(kind, pulser_ids)
+        return Transaction(log=self.transactions, pulser_ids=pulser_ids, cmd_id=cmd_id)
+
+    def commit(self, transaction: Transaction) -> int:
+        target = transaction.commit()
+        if target < 0:
+            self.tracker.cancel(transaction.cmd_id)
+        return target
 
     def action_tempo_up(self) -> None:
+        self.tempos.clear()
+        transaction = self.transaction("tempo")
         for pulser_ui in self.pulser_uis:
-            pulser_ui.pulser_display.tempos_up(self.internal_config.speed_diff)
+            pulser_ui.pulser_display.tempos_up(
+                self.internal_config.speed_diff, transaction=transaction
+            )
+        self.commit(transaction)
 
     def action_tempo_down(self) -> None:
+        self.tempos.clear()
+        transaction = self.transaction("tempo")
         for pulser_ui in self.pulser_uis:
-            pulser_ui.pulser_display.tempos_down(self.internal_config.speed_diff)
+            pulser_ui.pulser_display.tempos_down(
+                self.internal_config.speed_diff, transaction=transaction
+            )
+        self.commit(transaction)
+
+    def tempo_by(self, delta: float) -> None:
+        for pulser_ui in self.pulser_uis:
+            pulser_id = pulser_ui.pulser.pulser_id
+            pulser_display = pulser_ui.pulser_display
+            tempo = self.tempos.get(pulser_id, pulser_display.tempos_val) + delta
+            self.tempos[pulser_id] = max(tempo, 1.0)
+            pulser_display.tempos_val = self.tempos[pulser_id]
+        if not self.tempo_dirty:
+            self.tempo_dirty = True
+            self.schedule_flush_tempo()
+
+    def schedule_flush_tempo(self) -> None:
+        self.clock.set_timer(
+            owner=self,
+            delay=self.internal_config.controller_flush_s,
+            callback=self.flush_tempo,
+        )
+
+    def flush_tempo(self) -> None:
+        if len(self.tempos) == 0:
+            self.tempo_dirty = False
+            return None
+        pulser_ids = [pulser.pulser_id for pulser in self.pulser_devs]
+        if self.transactions.reached(pulser_ids, self.tempo_target):
+            transaction = self.transaction("tempo")
+            for pulser_id, tempo in self.tempos.items():
+                transaction.tempo(tempo, pulser_id=pulser_id)
+            target = self.commit(transaction)
+            if target >= 0:
+                self.tempo_target = target
+                self.tempo_dirty = False
+                return None
+        self.schedule_flush_tempo()
+
+    def rands_mag_by(self, delta: float) -> None:
+        rands_mag = self.external_config.rands_mag + delta
+        self.external_config.rands_mag = min(max(rands_mag, 0.0), 1.0)
+        self.randomize()
+        for pulser_ui in self.pulser_uis:
+            pulser_ui.pulser_display.copy_randoms(self.randoms[pulser_ui.pulser.pulses])
+
+    def action_toggle_profile(self) -> None:
+        self.profile.value = 0 if self.profile.value else 1
+        logging.info(f"Callback profiling {'on' if self.profile.value else 'off'}")
 
     def action_wait_up(self) -> None:
         for pulser_ui in self.pulser_uis:
@@ -472,7 +589,11 @@ class UI(App):
         self.randomize()
         changed = 0
         for pulser_ui in self.pulser_uis:
-            changed += int(pulser_ui.pulser_display.copy_randoms(self.randoms))
+            changed += int(
+                pulser_ui.pulser_display.copy_randoms(
+                    self.randoms[pulser_ui.pulser.pulses]
+                )
+            )
             changed += int(
                 pulser_ui.pulser_display.shuffle_program(shuffle_prog=new_prog)
             )
@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from .configs import InternalConfig
+
+LATE_TRANSACTION = 1
+UNDERFLOW = 2
+
+MESSAGES = {
+    LATE_TRANSACTION: (
+        logging.WARNING,
+        "Applied transaction on pulser {a:.0f} {b:.0f} parts late",
+    ),
+    UNDERFLOW: (logging.WARNING, "Output underflow at latency step {a:.0f}"),
+}
+
+
+class WorkerLog:
+    """Preallocated log and profile rings written from an audio callback.
+
+    The callback only stores numbers into numpy rows and bumps a counter, so
+    it never takes a lock or does I/O. A drain thread in the same worker
+    turns the rows into log records for the engine's queue listener, and
+    dumps the callback costs to a profile file when profiling is switched
+    off again.
+    """
+
+    def __init__(self, name: str, profile: Any, size: int):
+        self.internal_config = InternalConfig()
+        self.name = name
+        self.profile = profile
+        self.size = size
+        self.entries = np.zeros((size, 4), dtype=np.float64)
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.costs = np.zeros((size, 2), dtype=np.float64)
+        self.cost_head = 0
+        self.cost_start: Optional[int] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def log(self, code: int, a: float = 0.0, b: float = 0.0) -> None:
+        if self.head - self.tail >= self.size:
+            self.dropped += 1
+            return None
+        row = self.entries[self.head % self.size]
+        row[0] = time.time()
+        row[1] = code
+        row[2] = a
+        row[3] = b
+        self.head += 1
+
+    def sample(self, when: float, cost: float) -> None:
+        if self.profile.value:
+            row = self.costs[self.cost_head % self.size]
+            row[0] = when
+            row[1] = cost
+            self.cost_head += 1
+
+    def drain(self, handler: logging.Handler) -> int:
+        head = self.head
+        for index in range(self.tail, head):
+            when, code, a, b = self.entries[index % self.size]
+            level, message = MESSAGES[int(code)]
+            record = logging.LogRecord(
+                name=f"pulse_generator.{self.name}",
+                level=level,
+                pathname=__file__,
+                lineno=0,
+                msg=message.format(a=a, b=b),
+                args=None,
+                exc_info=None,
+            )
+            record.created = when
+            handler.handle(record)
+        drained = head - self.tail
+        self.tail = head
+        if self.dropped > 0:
+            dropped, self.dropped = self.dropped, 0
+            handler.handle(
+                logging.makeLogRecord(
+                    {
+                        "name": f"pulse_generator.{self.name}",
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"Dropped {dropped} worker log entries",
+                    }
+                )
+            )
+        return drained
+
+    def dump(self) -> Optional[str]:
+        if self.cost_start is None:
+            return None
+        start = max(self.cost_start, self.cost_head - self.size)
+        rows = [self.costs[index % self.size] for index in range(start, self.cost_head)]
+        self.cost_start = None
+        if len(rows) == 0:
+            return None
+        path = os.path.expanduser(
+            self.internal_config.profile_path.format(name=self.name)
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        costs = np.array(rows)
+        np.save(path, costs)
+        p50, p99, top = np.percentile(costs[:, 1], [50, 99, 100]) * 1000
+        logging.info(
+            f"Saved {len(rows)} {self.name} callback costs to {path}: "
+            f"p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {top:.3f} ms"
+        )
+        return path
+
+    def poll(self, handler: logging.Handler) -> None:
+        self.drain(handler)
+        if self.profile.value and self.cost_start is None:
+            self.cost_start = self.cost_head
+        elif not self.profile.value and self.cost_start is not None:
+            self.dump()
+
+    def run(self, handler: logging.Handler) -> None:
+        while True:
+            self.poll(handler)
+            time.sleep(self.internal_config.worker_drain_s)
+
+    def start(self, handler: logging.Handler) -> None:
+        self.thread = threading.Thread(target=self.run, args=(handler,), daemon=True)
+        self.thread.start()
@@ -3,8 +3,24 @@ from typing import List
 
 import pytest
 
+from pulse_generator.configs import ExternalConfig
+
 
 @pytest.fixture
 def command_line_args() -> List[str]:
     sys.argv = [__file__]
     return sys.argv
+
+
+@pytest.fixture
+def external_config() -> ExternalConfig:
+    return ExternalConfig(
+        frequency=400,
+        amplitude=1.0,
+        audio_dev_match="Virtual Audio",
+        tempos_init=60,
+        steps_init=12,
+        waits_init=1,
+        rands_init=1,
+        rands_mag=0.5,
+    )
@@ -0,0 +1,70 @@
+import pytest
+from attrs import evolve
+
+from pulse_generator.automation import STEP, STOP, TEMPO, compile_script
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+
+SCRIPT = """
+parts_per_bar = 2
+
+[[event]]
+bar = 2
+action = "tempo"
+value = 120
+pulsers = [0]
+
+[[event]]
+bar = 1
+action = "stop"
+pulsers = [0]
+
+[[event]]
+bar = 1
+step = 8
+action = "step"
+pulsers = [0]
+
+[[event]]
+bar = 1
+part = 1
+action = "start"
+"""
+
+
+def test_compile_script() -> None:
+    script = {
+        "parts_per_bar": 4,
+        "event": [
+            {"bar": 1, "step": 4, "action": "tempo", "value": 90},
+            {"part": 2, "action": "stop", "pulsers": [1]},
+            {"bar": 1, "step": 4, "action": "step"},
+        ],
+    }
+    tables = compile_script(script=script, pulser_steps={0: 12, 1: 12})
+    assert list(tables[0].positions) == [52, 52]
+    assert list(tables[0].actions) == [TEMPO, STEP]
+    assert list(tables[1].positions) == [26, 52, 52]
+    assert list(tables[1].actions) == [STOP, TEMPO, STEP]
+    with pytest.raises(ValueError):
+        compile_script({"event": [{"action": "jump"}]}, pulser_steps={0: 12})
+    with pytest.raises(ValueError):
+        compile_script({"event": [{"action": "stop", "step": 3}]}, {0: 12})
+
+
+def test_simulation_script(external_config: ExternalConfig, tmp_path) -> None:
+    path = tmp_path / "script.toml"
+    path.write_text(SCRIPT)
+    config = evolve(external_config, channels=2, script=str(path))
+    simulation = Simulation(external_config=config, devices=1, channels=2)
+    edges = simulation.run_for(60)
+    kinds_0 = [edge.kind for edge in edges if edge.pulser_id == 0]
+    kinds_1 = [edge.kind for edge in edges if edge.pulser_id == 1]
+    assert kinds_0[0:12] == ["pulse"] * 12
+    assert kinds_0[12:18] == ["skip"] * 3 + ["pulse"] + ["skip"] * 2
+    assert kinds_0[18:] == ["pulse"] * (len(kinds_0) - 18)
+    assert kinds_1 == ["pulse"] * len(kinds_1)
+    times = [edge.time for edge in edges if edge.pulser_id == 0]
+    intervals = [round(t1 - t0, 3) for t0, t1 in zip(times, times[1:])]
+    assert intervals[0:24] == [1.0] * 24
+    assert intervals[24:] == [0.5] * (len(intervals) - 24)
@@ -0,0 +1,39 @@
+import os
+from typing import Dict
+
+from pulse_generator.calibration import LatencyCache
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+
+
+def test_latency_cache(tmp_path) -> None:
+    path = os.path.join(tmp_path, "cache", "latency.json")
+    audio_dev_0 = {"index": 3, "name": "USB Audio 0", "hostapi": 0}
+    audio_dev_1 = {"index": 3, "name": "USB Audio 1", "hostapi": 0}
+    cache = LatencyCache(path=path)
+    assert not cache.has(audio_dev_0)
+    cache.put(audio_dev_0, 0.0042)
+    cache.save()
+    cache = LatencyCache(path=path)
+    assert cache.has(audio_dev_0)
+    assert not cache.has(audio_dev_1)
+    assert cache.get(audio_dev_0) == 0.0042
+    with open(path, "w") as cache_file:
+        cache_file.write("{")
+    assert not LatencyCache(path=path).has(audio_dev_0)
+
+
+class LatencySimulation(Simulation):
+
+    def get_latencies(self) -> Dict[int, float]:
+        return {0: 0.0, 1: 0.01}
+
+
+def test_latency_offsets(external_config: ExternalConfig) -> None:
+    simulation = LatencySimulation(external_config=external_config, devices=2)
+    assert [output.latency for output in simulation.outputs] == [0.0, 0.01]
+    edges = simulation.run_for(20)
+    block_sec = simulation.streams[0].block_sec
+    for edge_0, edge_1 in zip(edges[0::2], edges[1::2]):
+        assert (edge_1.pulser_id, edge_0.pulser_id) == (0, 1)
+        assert abs(edge_1.time - edge_0.time - 0.01) < block_sec
@@ -0,0 +1,53 @@
+import queue
+from typing import Any
+
+from pulse_generator.clock import VirtualClock
+from pulse_generator.commands import CommandTracker
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+
+
+def test_command_tracker() -> None:
+    clock = VirtualClock(start=1.0)
+    acks: Any = queue.Queue()
+    tracker = CommandTracker(ack_queue=acks, clock=clock)
+    cmd_id = tracker.submit("tempo", [0, 1])
+    dropped = tracker.submit("rand", [1])
+    tracker.cancel(dropped)
+    assert tracker.pending_count(1) == 1
+    acks.put((cmd_id, 0, 3, 2, 1.5))
+    assert tracker.poll() == 1
+    assert tracker.pending_count(0) == 0
+    assert tracker.pending_count(1) == 1
+    acks.put((cmd_id, 1, 3, 2, 2.0))
+    acks.put((dropped, 1, 3, 2, 2.0))
+    assert tracker.poll() == 2
+    assert tracker.pending_count(1) == 0
+    assert list(tracker.percentiles("tempo")) == [0.75, 0.95, 0.995]
+    assert tracker.counts == {"tempo": 2}
+
+
+def test_simulation_acks(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config)
+    simulation.run_for(10.5)
+    simulation.press("i")
+    simulation.press("9")
+    pulser_display = simulation.ui.pulser_uis[0].pulser_display
+    assert pulser_display.step()
+    simulation.run_for(1)
+    assert pulser_display.pending_val == 2
+    simulation.run_for(9)
+    assert pulser_display.pending_val == 0
+    assert simulation.tracker.counts == {"pause": 1, "tempo": 1, "step": 1}
+    assert abs(simulation.tracker.percentiles("pause")[0] - 6.5) < 1e-9
+    assert abs(simulation.tracker.percentiles("tempo")[0] - 6.5) < 1e-9
+    block_sec = simulation.outputs[0].min_length / simulation.outputs[0].sample_rate
+    assert 0.0 <= simulation.tracker.percentiles("step")[0] <= block_sec
+    simulation.press("a")
+    simulation.run_for(7)
+    simulation.press("a")
+    simulation.run_for(7)
+    simulation.tracker.poll()
+    assert simulation.tracker.counts["stop"] == 1
+    assert simulation.tracker.counts["start"] == 1
+    assert len(simulation.tracker.pending) == 0
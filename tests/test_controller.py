@@ -0,0 +1,65 @@
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.controller import (
+    EV_KEY,
+    EV_REL,
+    KEY_CODES,
+    REL_DIAL,
+    REL_WHEEL,
+    Controller,
+    InputEvent,
+)
+from pulse_generator.simulation import ReplayDevice, Simulation
+
+
+def test_controller_replay(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config)
+    simulation.run_for(10.5)
+    now = simulation.clock.time()
+    events = [
+        InputEvent(time=now - 0.004, type=EV_KEY, code=KEY_CODES["i"], value=1),
+        InputEvent(time=now - 0.003, type=EV_KEY, code=KEY_CODES["i"], value=0),
+        InputEvent(time=now - 0.002, type=EV_REL, code=REL_DIAL, value=12),
+        InputEvent(time=now - 0.001, type=EV_REL, code=REL_DIAL, value=8),
+        InputEvent(time=now, type=EV_REL, code=REL_WHEEL, value=-2),
+    ]
+    controller = Controller(
+        device=ReplayDevice(events),
+        ui=simulation.ui,
+        clock=simulation.clock,
+        dispatch=lambda callback: callback(),
+    )
+    controller.read_events()
+    assert len(controller.latencies) == 4
+    assert abs(max(controller.latencies) - 0.004) < 1e-9
+    assert abs(simulation.external_config.rands_mag - 0.4) < 1e-9
+    pulser_display = simulation.ui.pulser_uis[0].pulser_display
+    assert pulser_display.tempos_val == 80
+    edges = simulation.run_for(24)
+    kinds = [edge.kind for edge in edges]
+    assert kinds[6:12] == ["pulse"] * 6
+    assert kinds[12:18] == ["skip"] * 6
+    intervals = [round(e1.time - e0.time, 3) for e0, e1 in zip(edges, edges[1:])]
+    assert intervals[0:12] == [1.0] * 12
+    assert intervals[12:] == [0.75] * (len(intervals) - 12)
+    assert "p50" in controller.report()
+
+
+def test_controller_coalesces_tempo(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config)
+    simulation.run_for(10.5)
+    for _ in range(40):
+        simulation.ui.tempo_by(1.0)
+    simulation.run_for(0.5)
+    assert simulation.transactions.seq.value == 1
+    for _ in range(10):
+        simulation.ui.tempo_by(-1.0)
+    simulation.run_for(3)
+    assert simulation.transactions.seq.value == 1
+    assert simulation.ui.tempo_dirty
+    simulation.run_for(4)
+    assert simulation.transactions.seq.value == 2
+    assert not simulation.ui.tempo_dirty
+    pulser = simulation.pulser_devs[0]
+    assert pulser.tempo_bpm == 100
+    simulation.run_for(6)
+    assert pulser.tempo_bpm == 90
@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.follower import (
+    PERIOD,
+    PhaseLockedLoop,
+    SyncState,
+    detect_edges,
+)
+from pulse_generator.simulation import Simulation
+
+
+def test_detect_edges() -> None:
+    block = np.array([0.0, 1.0, 1.0, 0.0, 0.5, 0.0, 1.0], dtype=np.float32)
+    assert detect_edges(block, 0.3, above=False).tolist() == [1, 4, 6]
+    assert detect_edges(block[1:], 0.3, above=True).tolist() == [3, 5]
+
+
+def test_phase_locked_loop() -> None:
+    rng = random.Random(1)
+    pll = PhaseLockedLoop(alpha=0.5, beta=0.1, lock_edges=4, lock_tol=0.05)
+    for i in range(200):
+        if i == 100:
+            continue
+        pll.update(10.0 + i * 0.25 + rng.gauss(0.0, 0.0005))
+    assert pll.locked()
+    assert abs(pll.period - 0.25) < 0.001
+    assert abs(pll.next_edge - (10.0 + 200 * 0.25)) < 0.002
+    assert pll.jitter() < 0.002
+
+
+def test_follow_sync_state(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config)
+    sync_state = SyncState()
+    sync_state.publish(period=0.5, anchor=7.3, locked=True, latency=0.0, jitter=0.0)
+    assert sync_state.read()[PERIOD] == 0.5
+    assert sync_state.next_edge(7.9) == 8.3
+    simulation.pulser_devs[0].sync_state = sync_state
+    edges = simulation.run_for(20)
+    times = [edge.time for edge in edges]
+    assert abs(times[0] - 4.995) < 0.002
+    block_sec = simulation.streams[0].block_sec
+    for when in times[1:]:
+        beat = (when + 0.005 - 7.3) / 0.5
+        assert abs(beat - round(beat)) * 0.5 < block_sec + 1e-9
+    assert simulation.ui.pulser_uis[0].pulser_display.tempo_val == 120
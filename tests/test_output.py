@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+
+
+def test_output_adapts_latency(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config)
+    output = simulation.outputs[0]
+    out_data = np.zeros((output.min_length, output.channels), dtype=np.float32)
+    status = SimpleNamespace(output_underflow=True)
+    output.callback(out_data, len(out_data), None, status)
+    output.callback(out_data, len(out_data), None, None)
+    assert output.xruns == 1
+    assert output.adapt(xruns=1, stable_s=0.0) == 1
+    output.level = len(output.ladder) - 1
+    assert output.adapt(xruns=3, stable_s=0.0) == output.level
+    stable_s = output.internal_config.xrun_stable_s
+    assert output.adapt(xruns=0, stable_s=stable_s - 1) == output.level
+    assert output.adapt(xruns=0, stable_s=stable_s) == output.level - 1
+
+
+def test_output_compensates_latency(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config)
+    output = simulation.outputs[0]
+    right_time = output.right_times[0]
+    output.compensate(reported=0.001)
+    assert output.right_times[0] == right_time
+    output.compensate(reported=0.011)
+    assert abs(right_time - output.right_times[0] - 0.01) < 1e-9
+    output.compensate(reported=0.001)
+    assert output.right_times[0] == right_time
@@ -0,0 +1,116 @@
+from typing import List, Tuple
+
+from attrs import evolve
+
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Edge, Simulation
+
+
+def steps_and_kinds(edges: List[Edge], pulser_id: int = 0) -> List[Tuple[int, str]]:
+    return [(edge.step, edge.kind) for edge in edges if edge.pulser_id == pulser_id]
+
+
+def test_simulation_steady(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config, devices=2)
+    pulser_uis = simulation.ui.pulser_uis
+    assert simulation.ui.get_pulser_uis() is pulser_uis
+    assert len(pulser_uis) == 2
+    edges = simulation.run_for(3600)
+    assert len(edges) == 2 * 3596
+    assert steps_and_kinds(edges)[0:7] == [
+        (2, "pulse"),
+        (4, "pulse"),
+        (6, "pulse"),
+        (8, "pulse"),
+        (10, "pulse"),
+        (12, "pulse"),
+        (2, "pulse"),
+    ]
+    first = [edge for edge in edges if edge.pulser_id == 0]
+    assert abs(first[0].time - 4.995) < 0.002
+    assert abs(first[-1].time - first[0].time - 3595) < 0.002
+    for edge_0, edge_1 in zip(edges[0::2], edges[1::2]):
+        assert edge_0.time == edge_1.time
+
+
+def test_simulation_pause_and_tempo(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config)
+    simulation.run_for(10.5)
+    simulation.press("i")
+    simulation.press("9")
+    edges = simulation.run_for(24)
+    kinds = [kind for _, kind in steps_and_kinds(edges)]
+    assert kinds[6:12] == ["pulse"] * 6
+    assert kinds[12:18] == ["skip"] * 6
+    assert kinds[18:24] == ["pulse"] * 6
+    intervals = [round(e1.time - e0.time, 3) for e0, e1 in zip(edges, edges[1:])]
+    assert intervals[0:12] == [1.0] * 12
+    assert intervals[12:] == [0.75] * (len(intervals) - 12)
+    pulser_display = simulation.ui.pulser_uis[0].pulser_display
+    assert pulser_display.tempo_val == 80
+
+
+def test_simulation_deterministic(external_config: ExternalConfig) -> None:
+    runs = list()
+    for _ in range(2):
+        simulation = Simulation(external_config=external_config, seed=7)
+        simulation.run_for(8.5)
+        simulation.press("8")
+        simulation.press("5")
+        simulation.press("e")
+        runs.append(simulation.run_for(30))
+    assert runs[0] == runs[1]
+    offsets = {round((edge.time + 0.005) % 1.0, 3) for edge in runs[0]}
+    assert len(offsets) > 1
+
+
+def test_simulation_channels(external_config: ExternalConfig) -> None:
+    config = evolve(external_config, channels=2)
+    simulation = Simulation(external_config=config, devices=1, channels=2)
+    assert len(simulation.outputs) == 1
+    assert [pulser.channel for pulser in simulation.pulser_devs] == [0, 1]
+    simulation.run_for(10.5)
+    simulation.press("j")
+    simulation.pulser_devs[0].play_sound()
+    edges = [edge for edge in simulation.run_for(24) if edge.time >= 10.5]
+    assert [(edge.pulser_id, edge.kind) for edge in edges[0:3]] == [
+        (0, "sound"),
+        (0, "pulse"),
+        (1, "pulse"),
+    ]
+    edges = simulation.edges()
+    edges = [edge for edge in edges if edge.kind != "sound"]
+    for edge_0, edge_1 in zip(edges[0::2], edges[1::2]):
+        assert (edge_0.pulser_id, edge_1.pulser_id) == (0, 1)
+        assert edge_0.time == edge_1.time
+    kinds_0 = [kind for _, kind in steps_and_kinds(edges, pulser_id=0)]
+    kinds_1 = [kind for _, kind in steps_and_kinds(edges, pulser_id=1)]
+    assert kinds_0 == ["pulse"] * 30
+    assert kinds_1 == ["pulse"] * 12 + ["skip"] * 6 + ["pulse"] * 12
+
+
+def test_simulation_channel_map(external_config: ExternalConfig) -> None:
+    config = evolve(external_config, channel_map="1:1,0:0,1:0,3:0,0:5")
+    simulation = Simulation(external_config=config, devices=2, channels=2)
+    pairs = [
+        (output.output_id, [pulser.channel for pulser in output.pulsers])
+        for output in simulation.outputs
+    ]
+    assert pairs == [(0, [0]), (1, [1, 0])]
+    assert simulation.outputs[1].channels == 2
+
+
+def test_simulation_rand_parts(external_config: ExternalConfig) -> None:
+    config = evolve(external_config, rands_init=12)
+    simulation = Simulation(external_config=config, seed=3)
+    simulation.run_for(10.5)
+    simulation.press("e")
+    edges = simulation.run_for(120)
+    offsets = [round((edge.time + 0.005) % 1.0, 3) for edge in edges]
+    parts = [offsets[i : i + 6] for i in range(0, len(offsets), 6)]
+    shuffled = [part for part in parts if part != [0.0] * 6]
+    assert len(shuffled) == 12
+    assert parts[2:14] == shuffled
+    pulser_display = simulation.ui.pulser_uis[0].pulser_display
+    assert pulser_display.rand_val == pulser_display.rands_val == 12
+    assert not pulser_display.pause_button.disabled
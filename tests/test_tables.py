@@ -0,0 +1,39 @@
+import numpy as np
+
+from pulse_generator.tables import RandTable
+
+
+def test_rand_table() -> None:
+    table = RandTable(parts=12, length=4)
+    out = np.ones(4)
+    assert not table.busy()
+    assert not table.next_row(out)
+    assert out.tolist() == [0.0] * 4
+    rows = [[float(part)] * 4 for part in range(1, 11)]
+    assert table.publish(rows)
+    assert table.busy()
+    assert not table.publish([[9.0] * 4])
+    assert table.ack.value == 0
+    for part in range(1, 11):
+        assert table.next_row(out)
+        assert out.tolist() == [float(part)] * 4
+        assert table.ack.value == 1
+        assert table.busy() == (part < 10)
+    assert not table.next_row(out)
+    assert out.tolist() == [0.0] * 4
+    assert table.publish([[-1.0] * 4])
+    assert table.next_row(out)
+    assert out.tolist() == [-1.0] * 4
+    assert not table.next_row(out)
+
+
+def test_rand_table_limits() -> None:
+    table = RandTable(parts=2, length=3)
+    out = np.ones(3)
+    assert not table.publish([[1.0] * 3] * 3)
+    assert not table.busy()
+    assert table.publish([])
+    assert table.busy()
+    assert not table.next_row(out)
+    assert out.tolist() == [0.0] * 3
+    assert not table.busy()
@@ -0,0 +1,31 @@
+from fractions import Fraction
+
+from attrs import evolve
+
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+from pulse_generator.timebase import Timebase
+
+
+def test_timebase_has_no_drift() -> None:
+    timebase = Timebase(anchor=5.0, tempo_bpm=180)
+    for _ in range(1_000_000):
+        timebase.advance()
+    assert timebase.time() == 5.0 + 1_000_000 / 3
+    timebase.set_tempo(133.3)
+    assert timebase.interval == Fraction(600, 1333)
+    for _ in range(1333):
+        timebase.advance()
+    assert timebase.time() == 5.0 + 1_000_000 / 3 + 600
+
+
+def test_simulation_fractional_tempo(external_config: ExternalConfig) -> None:
+    config = evolve(external_config, tempos_init=180.5)
+    simulation = Simulation(external_config=config)
+    edges = simulation.run_for(3600)
+    block_sec = simulation.outputs[0].min_length / simulation.outputs[0].sample_rate
+    first = edges[0].time
+    for count, edge in enumerate(edges):
+        assert 0.0 <= edge.time - (first + count * 60 / 180.5) < block_sec
+    pulser_display = simulation.ui.pulser_uis[0].pulser_display
+    assert pulser_display.tempo_val == 180.5
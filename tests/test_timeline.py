@@ -0,0 +1,36 @@
+from attrs import evolve
+
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+from pulse_generator.timeline import boundary, position, realign
+
+
+def test_timeline() -> None:
+    assert position(0, 6) == (0, 2)
+    assert position(17, 6) == (2, 12)
+    assert position(17, 8) == (2, 4)
+    assert boundary(12, 6) == 17
+    assert boundary(17, 6) == 17
+    assert realign(0, [6, 8]) == 24
+    assert realign(24, [6, 8]) == 48
+
+
+def test_simulation_polymetric(external_config: ExternalConfig) -> None:
+    config = evolve(external_config, channels=2, pulser_steps=[12, 16])
+    simulation = Simulation(external_config=config, devices=1, channels=2)
+    assert [pulser.steps for pulser in simulation.pulser_devs] == [12, 16]
+    simulation.run_for(10.5)
+    simulation.press("9")
+    edges = simulation.run_for(40)
+    steps_0 = [edge.step for edge in edges if edge.pulser_id == 0]
+    steps_1 = [edge.step for edge in edges if edge.pulser_id == 1]
+    assert steps_0[0:13] == [2, 4, 6, 8, 10, 12] * 2 + [2]
+    assert steps_1[0:17] == [2, 4, 6, 8, 10, 12, 14, 16] * 2 + [2]
+    assert steps_0[24] == steps_1[24] == 2
+    for pulser_id, applied in [(0, 12), (1, 8)]:
+        times = [edge.time for edge in edges if edge.pulser_id == pulser_id]
+        intervals = [round(t_1 - t_0, 3) for t_0, t_1 in zip(times, times[1:])]
+        assert intervals[0:applied] == [1.0] * applied
+        assert set(intervals[applied:]) == {0.75}
+    uis = simulation.ui.pulser_uis
+    assert [len(pulser_ui.pulser_display.randoms) for pulser_ui in uis] == [6, 8]
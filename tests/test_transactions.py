@@ -0,0 +1,52 @@
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+from pulse_generator.transactions import TransactionLog
+
+
+def test_transaction_log() -> None:
+    log = TransactionLog(pulsers=2, length=3, slots=2)
+    log.report(pulser_id=0, tick=26, pulses=6)
+    log.report(pulser_id=1, tick=30, pulses=6)
+    assert log.commit([0, 1], flags=0, tempos={}, pause=0, row=None) == -1
+    assert log.commit([0, 1], flags=1, tempos={0: 90.0}, pause=0, row=None) == 30
+    log.report(pulser_id=1, tick=35, pulses=6)
+    assert log.commit([1], flags=2, tempos={}, pause=0, row=[1.0, 2.0, 3.0]) == 36
+    assert log.commit([0], flags=4, tempos={}, pause=1, row=None) == -1
+    assert log.pending(pulser_id=0, tick=29) == []
+    assert log.pending(pulser_id=0, tick=35) == [0]
+    assert log.pending(pulser_id=1, tick=41) == [0, 1]
+    assert not log.reached([0, 1], 30)
+    log.report(pulser_id=0, tick=36, pulses=6)
+    log.report(pulser_id=1, tick=36, pulses=6)
+    assert log.reached([0, 1], 30)
+    assert not log.reached([1], 36)
+    assert log.tempo(0, 0) == 90.0
+    assert log.tempo(0, 1) == 0.0
+    assert log.row(1).tolist() == [1.0, 2.0, 3.0]
+    log.ack(pulser_id=1, slot=1)
+    assert log.pending(pulser_id=1, tick=41) == [0]
+    assert log.free_slot() == 1
+    log.ack(pulser_id=0, slot=0)
+    log.ack(pulser_id=1, slot=0)
+    assert log.free_slot() == 0
+    assert log.pending(pulser_id=1, tick=47) == []
+
+
+def test_transaction_boundary(external_config: ExternalConfig) -> None:
+    simulation = Simulation(external_config=external_config, devices=3)
+    simulation.run_for(15.9)
+    simulation.press("9")
+    assert simulation.transactions.slot_target[0] == 12
+    simulation.run_for(30)
+    simulation.transaction([1]).pause(1).commit()
+    edges = simulation.run_for(30)
+    for pulser_id in range(3):
+        times = [edge.time for edge in edges if edge.pulser_id == pulser_id]
+        intervals = [round(t_1 - t_0, 3) for t_0, t_1 in zip(times, times[1:])]
+        assert intervals[0:18] == [1.0] * 18
+        assert set(intervals[18:]) == {0.75}
+        kinds = [edge.kind for edge in edges if edge.pulser_id == pulser_id]
+        skips = [i for i, kind in enumerate(kinds) if kind == "skip"]
+        assert skips == ([] if pulser_id != 1 else list(range(54, 60)))
+    for pulser_ui in simulation.ui.pulser_uis:
+        assert pulser_ui.pulser_display.tempo_val == 80
@@ -0,0 +1,69 @@
+import logging
+import multiprocessing as mp
+import queue
+from logging.handlers import QueueHandler
+from typing import Any, List
+
+import numpy as np
+
+from pulse_generator.configs import ExternalConfig
+from pulse_generator.simulation import Simulation
+from pulse_generator.worklog import LATE_TRANSACTION, UNDERFLOW, WorkerLog
+
+
+def drained(records: Any) -> List[logging.LogRecord]:
+    return [records.get() for _ in range(records.qsize())]
+
+
+def test_worker_log() -> None:
+    records: Any = queue.Queue()
+    worker_log = WorkerLog(name="output0", profile=mp.RawValue("b", 0), size=4)
+    for step in range(5):
+        worker_log.log(UNDERFLOW, step)
+    worker_log.sample(when=1.0, cost=0.001)
+    assert worker_log.cost_head == 0
+    assert worker_log.drain(QueueHandler(records)) == 4
+    messages = [record.getMessage() for record in drained(records)]
+    assert messages == [
+        "Output underflow at latency step 0",
+        "Output underflow at latency step 1",
+        "Output underflow at latency step 2",
+        "Output underflow at latency step 3",
+        "Dropped 1 worker log entries",
+    ]
+    worker_log.log(LATE_TRANSACTION, 2, 1)
+    assert worker_log.drain(QueueHandler(records)) == 1
+    assert drained(records)[0].name == "pulse_generator.output0"
+
+
+def test_simulation_profile(external_config: ExternalConfig, tmp_path) -> None:
+    records: Any = queue.Queue()
+    handler = QueueHandler(records)
+    simulation = Simulation(external_config=external_config)
+    worker_log = simulation.outputs[0].worker_log
+    worker_log.internal_config.profile_path = str(tmp_path / "profile-{name}.npy")
+    simulation.press("p")
+    worker_log.poll(handler)
+    simulation.run_for(20)
+    simulation.press("p")
+    worker_log.poll(handler)
+    costs = np.load(tmp_path / "profile-output0.npy")
+    assert costs.shape == (worker_log.cost_head, 2)
+    assert len(costs) >= 15
+    assert (costs[:, 1] > 0.0).all()
+    simulation.run_for(10)
+    assert worker_log.cost_head == len(costs)
+
+
+def test_simulation_late_transaction(external_config: ExternalConfig) -> None:
+    records: Any = queue.Queue()
+    simulation = Simulation(external_config=external_config)
+    simulation.run_for(10.5)
+    simulation.transaction().pause(1).commit()
+    simulation.transactions.slot_target[0] = 0
+    simulation.run_for(10)
+    worker_log = simulation.outputs[0].worker_log
+    assert worker_log.drain(QueueHandler(records)) == 1
+    assert drained(records)[0].getMessage() == (
+        "Applied transaction on pulser 0 1 parts late"
+    )